@@ -1,44 +1,215 @@
 # app/crud.py
 
 import sqlite3
-import json
-from typing import List, Optional, Dict
-from datetime import datetime, date
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Dict, Tuple
+from datetime import datetime, date, timedelta
+from app.database import after_commit, transaction
 from app.models import DeckCreate, Deck, CardCreate, Card, Settings
+from app.json_utils import loads as _json_loads, dumps as _json_dumps
+
+# --- Helper functions to parse rows into models ---
+# Rows come from our own tables, whose columns already have the models' types,
+# so they are built with model_construct instead of being validated again.
+def _dicts_to_decks(deck_dicts: Iterable[Dict[str, Any]]) -> List[Deck]:
+    return [Deck.model_construct(**deck_dict) for deck_dict in deck_dicts]
+
+def _row_to_deck(row: sqlite3.Row) -> Optional[Deck]:
+    return Deck.model_construct(**dict(row)) if row else None
+
+def _card_from_dict(card_dict: Dict[str, Any]) -> Card:
+    """
+    Builds a Card from a cards row without running Pydantic validation.
+    Trust boundary: rows in the cards table were written by this module from
+    already validated models, so only the storage conversions are redone here
+    (JSON data and ISO dates). Untrusted input is validated on the way in,
+    as CardCreate / Card, never on the way out.
+    """
+    card_dict['data'] = _json_loads(card_dict['data']) # Deserialize JSON string to dict
+    for field, parse in (
+        ('next_review_date', datetime.fromisoformat),
+        ('last_reviewed_date', datetime.fromisoformat),
+        ('introduction_date', date.fromisoformat),
+    ):
+        if card_dict[field] is not None:
+            card_dict[field] = parse(card_dict[field])
+        elif field == 'next_review_date':
+            del card_dict[field] # Column is nullable but the field isn't; use the model default
+    return Card.model_construct(**card_dict)
 
-# --- Helper function to parse a row into a Card model ---
 def _row_to_card(row: sqlite3.Row) -> Optional[Card]:
-    if not row:
-        return None
-    card_dict = dict(row)
-    card_dict['data'] = json.loads(card_dict['data']) # Deserialize JSON string to dict
-    return Card.model_validate(card_dict)
+    return _card_from_dict(dict(row)) if row else None
+
+def _fetchall_dicts(db: sqlite3.Connection, sql: str, params=()) -> List[Dict[str, Any]]:
+    """
+    Runs a query and returns one plain dict per row. Fetching raw tuples and
+    zipping them with the column names (read once) is cheaper than building a
+    sqlite3.Row for every row and then copying it into a dict.
+    """
+    cursor = db.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def _dicts_to_cards(card_dicts: List[Dict[str, Any]]) -> List[Card]:
+    return [_card_from_dict(card_dict) for card_dict in card_dicts]
+
+def _tomorrow_iso() -> str:
+    """ISO date of tomorrow. Since dates are stored as ISO strings, which sort
+    chronologically, `next_review_date < tomorrow` matches
+    `date(next_review_date) <= today` while still letting SQLite use the index
+    on the column (and likewise for `introduction_date` ranges)."""
+    return (date.today() + timedelta(days=1)).isoformat()
+
+def _commit(db: sqlite3.Connection):
+    # Inside database.transaction() the connection runs in autocommit mode and
+    # the surrounding block owns the COMMIT.
+    if db.isolation_level is not None:
+        db.commit()
+
+# SQL for the hottest lookups. sqlite3 caches compiled statements per
+# connection keyed by the SQL text, so these must never be built dynamically.
+_SQL_GET_DECK = "SELECT * FROM decks WHERE id = ?"
+_SQL_GET_CARD = "SELECT * FROM cards WHERE id = ?"
+_SQL_FIRST_CARD_IN_DECK = "SELECT * FROM cards WHERE deck_id = ? ORDER BY id LIMIT 1"
+_SQL_LOG_REVIEW = "INSERT INTO review_history (deck_id, card_id, review_timestamp, quality) VALUES (?, ?, ?, ?)"
+# Runs on every submitted rating
+_SQL_UPDATE_CARD_REVIEW = """UPDATE cards SET
+    next_review_date = ?,
+    interval_days = ?,
+    ease_factor = ?,
+    reviews = ?,
+    last_reviewed_date = ?,
+    state = ?,
+    learning_step = ?,
+    introduction_date = ?
+   WHERE id = ?"""
+# An upsert updates the existing row in place, where INSERT OR REPLACE would
+# delete it and insert a new one (with a new id)
+_SQL_SET_SETTING = """
+    INSERT INTO settings (setting_name, setting_value) VALUES (?, ?)
+    ON CONFLICT(setting_name) DO UPDATE SET setting_value = excluded.setting_value
+"""
+
+# INSERT/UPDATE ... RETURNING (SQLite 3.35+) hands back the written row
+# without a second SELECT round-trip.
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _write_returning(db: sqlite3.Connection, sql: str, params: tuple, select_sql: str, row_id: Optional[int] = None) -> Optional[sqlite3.Row]:
+    """
+    Runs a single-row INSERT or UPDATE, commits, and returns the row as stored.
+    On SQLite builds without RETURNING, the row is re-read with select_sql
+    using row_id (or the id of the inserted row).
+    """
+    if _HAS_RETURNING:
+        row = db.execute(sql + " RETURNING *", params).fetchone()
+        _commit(db)
+        return row
+    cursor = db.execute(sql, params)
+    _commit(db)
+    return db.execute(select_sql, (row_id if row_id is not None else cursor.lastrowid,)).fetchone()
+
+# --- In-process caches ---
+# Decks and settings are read on nearly every request but change rarely. The
+# write functions below drop the affected entries; the TTL bounds staleness
+# when several processes share the database file.
+_CACHE_TTL_SECONDS = 30.0
+_MISSING = object()
+
+class _TTLCache:
+    """
+    A minimal thread-safe dict whose entries expire after `ttl` seconds. Holds
+    at most `maxsize` entries, evicting the least recently used one first.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, db: sqlite3.Connection, key, value):
+        # Rows read inside an open write transaction may never be committed
+        if db.in_transaction:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+_deck_cache = _TTLCache(_CACHE_TTL_SECONDS, maxsize=256)
+_settings_cache = _TTLCache(_CACHE_TTL_SECONDS, maxsize=64)
+# Keys for the whole-table results; never equal to a setting name
+_ALL_SETTINGS_KEY = object()       # get_all_settings()
+_ALL_SETTINGS_DICT_KEY = object()  # get_all_settings_dict()
+
+def _invalidate(db: sqlite3.Connection, cache: _TTLCache, *keys):
+    """
+    Drops cache entries once the write that changed them is committed. Dropping
+    them earlier, inside an open transaction, would let another connection
+    re-cache the old committed row for the whole TTL.
+    """
+    def drop():
+        for key in keys:
+            cache.pop(key)
+    after_commit(db, drop)
+
+def clear_caches():
+    """Drops every cached deck and setting, e.g. after editing the database by hand."""
+    _deck_cache.clear()
+    _settings_cache.clear()
 
 # --- Deck CRUD ---
 def create_deck(db: sqlite3.Connection, deck: DeckCreate) -> Deck:
-    cursor = db.cursor()
-    cursor.execute(
+    row = _write_returning(
+        db,
         "INSERT INTO decks (name, card_template, card_css, media_folder) VALUES (?, ?, ?, ?)",
-        (deck.name, deck.card_template, deck.card_css, deck.media_folder)
+        (deck.name, deck.card_template, deck.card_css, deck.media_folder),
+        _SQL_GET_DECK
     )
-    db.commit()
-    deck_id = cursor.lastrowid
-    return get_deck(db, deck_id)
+    deck = _row_to_deck(row)
+    _invalidate(db, _deck_cache, deck.id)
+    return deck
 
 def get_deck(db: sqlite3.Connection, deck_id: int) -> Optional[Deck]:
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM decks WHERE id = ?", (deck_id,))
-    row = cursor.fetchone()
-    return Deck.model_validate(dict(row)) if row else None
+    deck = _deck_cache.get(deck_id)
+    if deck is not _MISSING:
+        return deck
+    deck = _row_to_deck(db.execute(_SQL_GET_DECK, (deck_id,)).fetchone())
+    if deck is not None: # Don't let lookups of made-up ids fill the cache
+        _deck_cache.set(db, deck_id, deck)
+    return deck
 
 def get_all_decks(db: sqlite3.Connection) -> List[Deck]:
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM decks")
-    return [Deck.model_validate(dict(row)) for row in cursor.fetchall()]
+    return _dicts_to_decks(_fetchall_dicts(db, "SELECT * FROM decks"))
 
 def update_deck_settings(db: sqlite3.Connection, deck_id: int, name: str, media_folder: Optional[str], new_cards: Optional[int], max_reviews: Optional[int], learning_steps: Optional[str], graduating_interval: Optional[int]) -> Optional[Deck]:
-    cursor = db.cursor()
-    cursor.execute(
+    row = _write_returning(
+        db,
         """UPDATE decks SET
             name = ?,
             media_folder = ?,
@@ -47,246 +218,389 @@ def update_deck_settings(db: sqlite3.Connection, deck_id: int, name: str, media_
             learning_steps = ?,
             graduating_interval = ?
            WHERE id = ?""",
-        (name, media_folder, new_cards, max_reviews, learning_steps, graduating_interval, deck_id)
+        (name, media_folder, new_cards, max_reviews, learning_steps, graduating_interval, deck_id),
+        _SQL_GET_DECK, deck_id
     )
-    db.commit()
-    return get_deck(db, deck_id)
+    _invalidate(db, _deck_cache, deck_id)
+    return _row_to_deck(row)
 
 def update_deck_layout(db: sqlite3.Connection, deck_id: int, card_template: str, card_css: str) -> Optional[Deck]:
     """Updates the layout-related fields for a specific deck."""
-    cursor = db.cursor()
-    cursor.execute(
-        """UPDATE decks SET            
+    row = _write_returning(
+        db,
+        """UPDATE decks SET
             card_template = ?,
             card_css = ?
            WHERE id = ?""",
-        (card_template, card_css, deck_id)
+        (card_template, card_css, deck_id),
+        _SQL_GET_DECK, deck_id
     )
-    db.commit()
-    return get_deck(db, deck_id)
+    _invalidate(db, _deck_cache, deck_id)
+    return _row_to_deck(row)
 
 def delete_deck(db: sqlite3.Connection, deck_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
-    db.commit()
+    db.execute("DELETE FROM decks WHERE id = ?", (deck_id,))
+    _commit(db)
+    _invalidate(db, _deck_cache, deck_id)
 
 # --- Card CRUD ---
 def get_card(db: sqlite3.Connection, card_id: int) -> Optional[Card]:
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM cards WHERE id = ?", (card_id,))
-    row = cursor.fetchone()
-    return _row_to_card(row)
+    return _row_to_card(db.execute(_SQL_GET_CARD, (card_id,)).fetchone())
+
+# Supported orderings for get_all_cards_in_deck, one fixed statement each so
+# the sort happens in SQLite (by index where possible) instead of in Python.
+# LIMIT -1 means "no limit" to SQLite, so one statement serves both whole and paged listings
+_SQL_CARDS_IN_DECK = {
+    "id": "SELECT * FROM cards WHERE deck_id = ? ORDER BY id LIMIT ? OFFSET ?",
+    "next_review_date": "SELECT * FROM cards WHERE deck_id = ? ORDER BY next_review_date, id LIMIT ? OFFSET ?",
+}
+
+def get_all_cards_in_deck(db: sqlite3.Connection, deck_id: int, order_by: str = "id",
+                          limit: Optional[int] = None, offset: int = 0) -> List[Card]:
+    """
+    Returns the cards of a deck, ordered by creation ("id") or due date ("next_review_date").
+    Pass limit/offset to fetch a single page instead of the whole deck.
+    """
+    params = (deck_id, -1 if limit is None else limit, offset)
+    return _dicts_to_cards(_fetchall_dicts(db, _SQL_CARDS_IN_DECK[order_by], params))
 
-def get_all_cards_in_deck(db: sqlite3.Connection, deck_id: int) -> List[Card]:
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM cards WHERE deck_id = ?", (deck_id,))
-    return [_row_to_card(row) for row in cursor.fetchall()]
+def get_first_card_in_deck(db: sqlite3.Connection, deck_id: int) -> Optional[Card]:
+    """Returns the deck's oldest card (e.g. as sample data), without loading the others."""
+    return _row_to_card(db.execute(_SQL_FIRST_CARD_IN_DECK, (deck_id,)).fetchone())
 
 def update_card_data(db: sqlite3.Connection, card_id: int, card_data: Dict) -> Optional[Card]:
     """Updates only the 'data' JSON field of a specific card."""
-    cursor = db.cursor()
-    data_json = json.dumps(card_data)
-    cursor.execute(
+    data_json = _json_dumps(card_data)
+    row = _write_returning(
+        db,
         """UPDATE cards SET data = ? WHERE id = ?""",
-        (data_json, card_id)
+        (data_json, card_id),
+        _SQL_GET_CARD, card_id
     )
-    db.commit()
-    return get_card(db, card_id)
+    return _row_to_card(row)
 
 def get_total_card_count_in_deck(db: sqlite3.Connection, deck_id: int) -> int:
     """Gets the total number of cards in a given deck, regardless of state."""
-    cursor = db.cursor()
-    cursor.execute("SELECT COUNT(*) FROM cards WHERE deck_id = ?", (deck_id,))
-    return cursor.fetchone()[0]
+    return db.execute("SELECT COUNT(*) FROM cards WHERE deck_id = ?", (deck_id,)).fetchone()[0]
+
+# Counts every queue in one pass over the deck's entries in
+# idx_cards_deck_queue (a covering index for this query):
+#   learning: due now, review: due today, new: every card not yet introduced.
+_SQL_QUEUE_COUNTS = """
+    SELECT state, COUNT(*) FROM cards
+    WHERE deck_id = :deck_id
+      AND (state != 'learning' OR next_review_date <= :now)
+      AND (state != 'review' OR next_review_date < :tomorrow)
+    GROUP BY state
+"""
 
 def get_queue_counts(db: sqlite3.Connection, deck_id: int, new_card_limit: int) -> Dict[str, int]:
-    """Gets the count of cards in each queue for a given deck."""
-    cursor = db.cursor()
-    now_iso = datetime.now().isoformat()
-    today_iso = date.today().isoformat()
-
-    # Learning cards due now
-    cursor.execute(
-        "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND state = 'learning' AND next_review_date <= ?",
-        (deck_id, now_iso)
-    )
-    learning_count = cursor.fetchone()[0]
-
-    # Review cards due today. Uses date(next_review_date) instead of just next_review_date.
-    cursor.execute(
-        "SELECT * FROM cards WHERE deck_id = ? AND state = 'review' AND date(next_review_date) <= ?",
-        (deck_id, today_iso)
-    )
-    
-    review_count = len(cursor.fetchall())
-
-    # New cards available today
-    # 1. Count how many new cards have already been introduced today.
-    # cursor.execute(
-    #     "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND date(introduction_date) = ?",
-    #     (deck_id, today_iso)
-    # )
-    # new_cards_introduced_today = cursor.fetchone()[0]
-
-    # # 2. Calculate the number of "new card slots" remaining for today.
-    # # It can't be negative, so we use max(0, ...).
-    # remaining_new_slots = max(0, new_card_limit - new_cards_introduced_today)
-
-    # 3. Count how many cards are actually in the 'new' state.
-    cursor.execute(
-        "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND state = 'new'",
-        (deck_id,)
-    )
-    actual_new_cards_in_deck = cursor.fetchone()[0]
-    
-    # 4. The number to display is the smaller of the remaining slots and the actual new cards available.
-    new_count = actual_new_cards_in_deck # min(remaining_new_slots, actual_new_cards_in_deck)
-    return {"learning": learning_count, "review": review_count, "new": new_count}
-
+    """
+    Gets the count of cards in each queue for a given deck.
+    The new count is every card in the 'new' state; it is not capped by new_card_limit.
+    """
+    rows = db.execute(_SQL_QUEUE_COUNTS, {
+        "deck_id": deck_id,
+        "now": datetime.now().isoformat(),
+        "tomorrow": _tomorrow_iso(),
+    }).fetchall()
+    counts = {"learning": 0, "review": 0, "new": 0}
+    for state, count in rows:
+        if state in counts:
+            counts[state] = count
+    return counts
+
+
+# One statement for the whole queue lookup, kept as a constant so the
+# connection's statement cache reuses the compiled plan. Each branch picks at
+# most one card id straight from the queue index (every index entry carries the
+# rowid, so no table access is needed), the priorities decide between them, and
+# only the winning card's full row is read:
+#   1. Learning cards due now
+#   2. Review cards due today
+#   3. New cards, while fewer than :new_limit were introduced today
+_SQL_NEXT_CARD_ID = """
+        SELECT id FROM (
+            SELECT * FROM (
+                SELECT id, 1 AS queue_priority FROM cards
+                WHERE deck_id = :deck_id AND state = 'learning' AND next_review_date <= :now
+                ORDER BY next_review_date ASC LIMIT 1
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT id, 2 AS queue_priority FROM cards
+                WHERE deck_id = :deck_id AND state = 'review' AND next_review_date < :tomorrow
+                ORDER BY next_review_date ASC LIMIT 1
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT id, 3 AS queue_priority FROM cards
+                WHERE deck_id = :deck_id AND state = 'new'
+                  AND (SELECT COUNT(*) FROM cards
+                       WHERE deck_id = :deck_id AND introduction_date >= :today
+                         AND introduction_date < :tomorrow) < :new_limit
+                ORDER BY id ASC LIMIT 1
+            )
+        )
+        ORDER BY queue_priority LIMIT 1
+"""
+_SQL_NEXT_CARD = f"SELECT * FROM cards WHERE id = ({_SQL_NEXT_CARD_ID})"
 
 def get_next_card_for_review(db: sqlite3.Connection, deck_id: int, new_card_limit: int, total_limit: int) -> Optional[Card]:
     """
     Fetches the single most important card to review right now, based on Anki's queue priorities.
+    Returns None when there's nothing left to study for today.
     """
-    cursor = db.cursor()
-    now_iso = datetime.now().isoformat()
-    today_iso = date.today().isoformat()
-    
-    # --- Priority 1: Learning cards due now ---
-    cursor.execute(
-        """SELECT * FROM cards 
-           WHERE deck_id = ? AND state = 'learning' AND next_review_date <= ?
-           ORDER BY next_review_date ASC LIMIT 1""",
-        (deck_id, now_iso)
-    )
-    card = _row_to_card(cursor.fetchone())
-    if card:
-        return card
-
-    # --- Priority 2: Review cards due today ---
-    cursor.execute(
-        """SELECT * FROM cards 
-           WHERE deck_id = ? AND state = 'review' AND date(next_review_date) <= ?           
-           ORDER BY next_review_date ASC LIMIT 1""",
-        (deck_id, today_iso)
-    )
-    card = _row_to_card(cursor.fetchone())
-    if card:
-        return card
-
-    # --- Priority 3: New cards, up to the daily limit ---
-    # Count how many new cards have been introduced today
-    cursor.execute(
-        "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND date(introduction_date) = ?",
-        (deck_id, today_iso)
-    )
-    new_cards_introduced_today = cursor.fetchone()[0]
-    
-    if new_cards_introduced_today < new_card_limit:
-        cursor.execute(
-            """SELECT * FROM cards 
-               WHERE deck_id = ? AND state = 'new'
-               ORDER BY id ASC LIMIT 1""",
-            (deck_id,)
-        )
-        card = _row_to_card(cursor.fetchone())
-        if card:
-            return card
+    row = db.execute(_SQL_NEXT_CARD, {
+        "deck_id": deck_id,
+        "now": datetime.now().isoformat(),
+        "today": date.today().isoformat(),
+        "tomorrow": _tomorrow_iso(),
+        "new_limit": new_card_limit,
+    }).fetchone()
+    return _row_to_card(row)
 
-    # If we reach here, there's nothing left to study for today
-    return None
+# Everything the study page needs in one round trip: today's review count
+# (range search on idx_review_history_deck_ts), the queue counts (same rules
+# as _SQL_QUEUE_COUNTS, from the covering idx_cards_deck_queue) and the
+# next card's row, or NULLs when there is none.
+_SQL_STUDY_CONTEXT = f"""
+    SELECT
+        (SELECT COUNT(*) FROM review_history
+         WHERE deck_id = :deck_id AND review_timestamp >= :today
+           AND review_timestamp < :tomorrow) AS reviews_done_today,
+        q.learning_count, q.review_count, q.new_count, c.*
+    FROM (
+        SELECT
+            COUNT(*) FILTER (WHERE state = 'learning' AND next_review_date <= :now) AS learning_count,
+            COUNT(*) FILTER (WHERE state = 'review' AND next_review_date < :tomorrow) AS review_count,
+            COUNT(*) FILTER (WHERE state = 'new') AS new_count
+        FROM cards WHERE deck_id = :deck_id
+    ) q
+    LEFT JOIN cards c ON c.id = ({_SQL_NEXT_CARD_ID})
+"""
+
+def get_study_context(db: sqlite3.Connection, deck_id: int, new_card_limit: int) -> Dict[str, Any]:
+    """
+    Returns {"reviews_done_today", "queue_counts", "next_card"} for a deck with a
+    single query. The values match get_reviews_done_today(), get_queue_counts()
+    and get_next_card_for_review() respectively.
+    """
+    row = _fetchall_dicts(db, _SQL_STUDY_CONTEXT, {
+        "deck_id": deck_id,
+        "now": datetime.now().isoformat(),
+        "today": date.today().isoformat(),
+        "tomorrow": _tomorrow_iso(),
+        "new_limit": new_card_limit,
+    })[0]
+    return {
+        "reviews_done_today": row.pop("reviews_done_today"),
+        "queue_counts": {
+            "learning": row.pop("learning_count"),
+            "review": row.pop("review_count"),
+            "new": row.pop("new_count"),
+        },
+        "next_card": _card_from_dict(row) if row["id"] is not None else None,
+    }
 
 def create_card(db: sqlite3.Connection, card: CardCreate) -> Card:
-    cursor = db.cursor()
-    data_json = json.dumps(card.data)
+    data_json = _json_dumps(card.data)
     # We must explicitly set next_review_date to prevent a NULL value
     # that would fail Pydantic validation.
-    cursor.execute(
+    row = _write_returning(
+        db,
         "INSERT INTO cards (deck_id, data, next_review_date) VALUES (?, ?, ?)",
-        (card.deck_id, data_json, datetime.now().isoformat())
+        (card.deck_id, data_json, datetime.now().isoformat()),
+        _SQL_GET_CARD
     )
-    db.commit()
-    card_id = cursor.lastrowid
-    return get_card(db, card_id)
+    return _row_to_card(row)
 
-def update_card_review_data(db: sqlite3.Connection, card: Card) -> Optional[Card]:
-    cursor = db.cursor()
+def create_cards_bulk(db: sqlite3.Connection, cards: Iterable[CardCreate]) -> int:
+    """
+    Inserts many cards in a single transaction with one executemany call, so a
+    whole deck import costs one commit instead of one per card. `cards` may be
+    any iterable, including a generator. Returns the number of cards inserted.
+    """
+    now_iso = datetime.now().isoformat()
+    with transaction(db):
+        cursor = db.executemany(
+            "INSERT INTO cards (deck_id, data, next_review_date) VALUES (?, ?, ?)",
+            ((card.deck_id, _json_dumps(card.data), now_iso) for card in cards)
+        )
+    return cursor.rowcount
 
+def update_card_review_data(db: sqlite3.Connection, card: Card) -> Optional[Card]:
     # Convert introduction_date to ISO format if it exists
     intro_date_iso = card.introduction_date.isoformat() if card.introduction_date else None
     last_reviewed_iso = card.last_reviewed_date.isoformat() if card.last_reviewed_date else None
 
-    cursor.execute(
-        """UPDATE cards SET
-            next_review_date = ?,
-            interval_days = ?,
-            ease_factor = ?,
-            reviews = ?,
-            last_reviewed_date = ?,
-            state = ?,
-            learning_step = ?,
-            introduction_date = ?
-           WHERE id = ?""",
+    row = _write_returning(
+        db,
+        _SQL_UPDATE_CARD_REVIEW,
         (
             card.next_review_date.isoformat(), card.interval_days, card.ease_factor,
             card.reviews, last_reviewed_iso, card.state,
             card.learning_step, intro_date_iso, card.id
-        )
+        ),
+        _SQL_GET_CARD, card.id
     )
-    db.commit()
-    return get_card(db, card.id)
+    return _row_to_card(row)
 
 def delete_card(db: sqlite3.Connection, card_id: int):
-    cursor = db.cursor()
-    cursor.execute("DELETE FROM cards WHERE id = ?", (card_id,))
-    db.commit()
+    db.execute("DELETE FROM cards WHERE id = ?", (card_id,))
+    _commit(db)
+
+# --- Settings CRUD ---
+# Global values used when a setting was never saved (or was saved empty)
+DEFAULT_SETTINGS = {
+    "new_cards_per_day": "5",
+    "max_reviews_per_day": "20",
+    "learning_steps": "10 1440",
+    "graduating_interval": "4",
+}
 
-# --- Settings CRUD (Unchanged) ---
 def get_setting(db: sqlite3.Connection, setting_name: str) -> Optional[str]:
-    cursor = db.cursor()
-    cursor.execute("SELECT setting_value FROM settings WHERE setting_name = ?", (setting_name,))
-    row = cursor.fetchone()
-    return row[0] if row else None
+    value = _settings_cache.get(setting_name)
+    if value is not _MISSING:
+        return value
+    row = db.execute("SELECT setting_value FROM settings WHERE setting_name = ?", (setting_name,)).fetchone()
+    value = row[0] if row else None
+    _settings_cache.set(db, setting_name, value)
+    return value
 
 def set_setting(db: sqlite3.Connection, setting_name: str, setting_value: str) -> Settings:
-    cursor = db.cursor()
-    cursor.execute(
-        "INSERT OR REPLACE INTO settings (setting_name, setting_value) VALUES (?, ?)",
-        (setting_name, setting_value)
-    )
-    db.commit()
+    db.execute(_SQL_SET_SETTING, (setting_name, setting_value))
+    _commit(db)
+    _invalidate(db, _settings_cache, setting_name, _ALL_SETTINGS_KEY, _ALL_SETTINGS_DICT_KEY)
     return Settings(setting_name=setting_name, setting_value=setting_value)
 
+def set_settings_bulk(db: sqlite3.Connection, settings: Iterable[Tuple[str, str]]):
+    """Saves several (setting_name, setting_value) pairs with one executemany in one transaction."""
+    settings = list(settings)
+    with transaction(db):
+        db.executemany(_SQL_SET_SETTING, settings)
+        # Registered inside the block, so a surrounding transaction defers it too
+        _invalidate(db, _settings_cache, *(setting_name for setting_name, _ in settings),
+                    _ALL_SETTINGS_KEY, _ALL_SETTINGS_DICT_KEY)
+
 def get_all_settings(db: sqlite3.Connection) -> List[Settings]:
-    cursor = db.cursor()
-    cursor.execute("SELECT * FROM settings")
-    return [Settings.model_validate(dict(row)) for row in cursor.fetchall()]
+    all_settings = _settings_cache.get(_ALL_SETTINGS_KEY)
+    if all_settings is not _MISSING:
+        return list(all_settings)
+    all_settings = [Settings.model_validate(row) for row in _fetchall_dicts(db, "SELECT * FROM settings")]
+    _settings_cache.set(db, _ALL_SETTINGS_KEY, all_settings)
+    return list(all_settings)
+
+def get_all_settings_dict(db: sqlite3.Connection) -> Dict[str, str]:
+    """
+    Returns every setting as a plain {name: value} mapping. Cheaper than
+    get_all_settings() for internal callers that only read values, since no
+    Settings models are validated.
+    """
+    all_settings = _settings_cache.get(_ALL_SETTINGS_DICT_KEY)
+    if all_settings is _MISSING:
+        cursor = db.cursor()
+        cursor.row_factory = None
+        cursor.execute("SELECT setting_name, setting_value FROM settings")
+        all_settings = dict(cursor.fetchall())
+        _settings_cache.set(db, _ALL_SETTINGS_DICT_KEY, all_settings)
+    return dict(all_settings)
+
+def get_global_settings(db: sqlite3.Connection) -> Dict[str, str]:
+    """get_all_settings_dict() with DEFAULT_SETTINGS filling in missing or empty values."""
+    settings = get_all_settings_dict(db)
+    for setting_name, default in DEFAULT_SETTINGS.items():
+        if not settings.get(setting_name):
+            settings[setting_name] = default
+    return settings
 
 def log_review(db: sqlite3.Connection, deck_id: int, card_id: int, quality: int):
     """Inserts a record of a single review action into the history table."""
-    cursor = db.cursor()
-    cursor.execute(
-        "INSERT INTO review_history (deck_id, card_id, review_timestamp, quality) VALUES (?, ?, ?, ?)",
-        (deck_id, card_id, datetime.now().isoformat(), quality)
-    )
-    db.commit()
+    db.execute(_SQL_LOG_REVIEW, (deck_id, card_id, datetime.now().isoformat(), quality))
+    _commit(db)
+
+def log_reviews_bulk(db: sqlite3.Connection, reviews: Iterable[Tuple[int, int, int]]) -> int:
+    """
+    Logs many (deck_id, card_id, quality) review actions with one executemany
+    in one transaction, all stamped with the current time. Returns the number
+    of reviews logged.
+    """
+    now_iso = datetime.now().isoformat()
+    with transaction(db):
+        cursor = db.executemany(
+            _SQL_LOG_REVIEW,
+            ((deck_id, card_id, now_iso, quality) for deck_id, card_id, quality in reviews)
+        )
+    return cursor.rowcount
 
 def get_reviews_done_today(db: sqlite3.Connection, deck_id: int) -> int:
     """Counts the number of review actions logged today for a specific deck."""
-    cursor = db.cursor()
     today_iso = date.today().isoformat()
-    cursor.execute(
-        "SELECT COUNT(*) FROM review_history WHERE deck_id = ? AND date(review_timestamp) = ?",
-        (deck_id, today_iso)
-    )
-    return cursor.fetchone()[0]
+    # A range on the raw timestamp (rather than date(review_timestamp) = ?)
+    # lets SQLite answer from idx_review_history_deck_ts, touching only
+    # today's entries however long the history grows.
+    return db.execute(
+        "SELECT COUNT(*) FROM review_history WHERE deck_id = ? AND review_timestamp >= ? AND review_timestamp < ?",
+        (deck_id, today_iso, _tomorrow_iso())
+    ).fetchone()[0]
 
 def get_new_cards_rated_today(db: sqlite3.Connection, deck_id: int) -> int:
     """Counts how many new cards have had their first review today."""
-    cursor = db.cursor()
     today_iso = date.today().isoformat()
-    cursor.execute(
-        "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND date(introduction_date) = ?",
-        (deck_id, today_iso)
-    )
-    return cursor.fetchone()[0]
\ No newline at end of file
+    return db.execute(
+        "SELECT COUNT(*) FROM cards WHERE deck_id = ? AND introduction_date >= ? AND introduction_date < ?",
+        (deck_id, today_iso, _tomorrow_iso())
+    ).fetchone()[0]
+
+# Everything the deck list shows, for every deck, in one statement: the queue
+# counts (same rules as _SQL_QUEUE_COUNTS), the card total and the cards
+# introduced today come from a single pass over the covering
+# idx_cards_deck_queue, and today's reviews are a range search on
+# idx_review_history_deck_ts per deck.
+_SQL_DECKS_WITH_STATS = """
+    SELECT d.*,
+        COALESCE(c.total_card_count, 0) AS total_card_count,
+        COALESCE(c.learning, 0) AS learning,
+        COALESCE(c.review, 0) AS review,
+        COALESCE(c.new, 0) AS new,
+        COALESCE(c.new_cards_rated_today, 0) AS new_cards_rated_today,
+        (SELECT COUNT(*) FROM review_history r
+         WHERE r.deck_id = d.id AND r.review_timestamp >= :today
+           AND r.review_timestamp < :tomorrow) AS reviews_done_today
+    FROM decks d
+    LEFT JOIN (
+        SELECT deck_id,
+            COUNT(*) AS total_card_count,
+            COUNT(*) FILTER (WHERE state = 'learning' AND next_review_date <= :now) AS learning,
+            COUNT(*) FILTER (WHERE state = 'review' AND next_review_date < :tomorrow) AS review,
+            COUNT(*) FILTER (WHERE state = 'new') AS new,
+            COUNT(*) FILTER (WHERE introduction_date >= :today
+                               AND introduction_date < :tomorrow) AS new_cards_rated_today
+        FROM cards GROUP BY deck_id
+    ) c ON c.deck_id = d.id
+    ORDER BY d.id
+"""
+
+def get_all_decks_with_stats(db: sqlite3.Connection) -> List[Dict[str, Any]]:
+    """
+    Returns one dict per deck with the deck itself plus its counters:
+    {"deck", "counts", "total_card_count", "reviews_done_today", "new_cards_rated_today"},
+    where "counts" matches get_queue_counts(). Replaces one round of queries per deck.
+    """
+    rows = _fetchall_dicts(db, _SQL_DECKS_WITH_STATS, {
+        "now": datetime.now().isoformat(),
+        "today": date.today().isoformat(),
+        "tomorrow": _tomorrow_iso(),
+    })
+    stats = [
+        {
+            "counts": {key: row.pop(key) for key in ("learning", "review", "new")},
+            "total_card_count": row.pop("total_card_count"),
+            "reviews_done_today": row.pop("reviews_done_today"),
+            "new_cards_rated_today": row.pop("new_cards_rated_today"),
+        }
+        for row in rows
+    ]
+    for deck, deck_stats in zip(_dicts_to_decks(rows), stats):
+        deck_stats["deck"] = deck
+    return stats
\ No newline at end of file
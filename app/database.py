@@ -1,24 +1,185 @@
 # app/database.py
 
+import atexit
+import queue
 import sqlite3
-from typing import Optional
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+import anyio
+from anyio.lowlevel import RunVar
 
 DATABASE_URL = "memo_flow.db"
+# At most POOL_SIZE requests run queries at the same time; the others wait for
+# a connection to be released. The wait must not take up one of the worker
+# threads route handlers run on (Starlette's threadpool has 40), or waiting
+# requests can starve the ones holding a connection; see get_db().
+POOL_SIZE = 5
+# How long acquire() waits for a free connection before giving up
+POOL_TIMEOUT_SECONDS = 10.0
+# Compiled statements kept per connection (sqlite3's default is 128)
+CACHED_STATEMENTS = 256
+
+# Applied once per connection. Since pooled connections live for the whole
+# process, SQLite's page cache and memory map are kept warm between requests.
+# WAL mode is not in this list: it's stored in the database file, so
+# create_tables() switches it on once.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA wal_autocheckpoint = 1000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -64000",   # ~64 MB
+    "PRAGMA mmap_size = 268435456", # 256 MB
+)
 
-def get_db():    
-    conn = sqlite3.connect(DATABASE_URL, check_same_thread=False)
+def connect(database: str = DATABASE_URL) -> sqlite3.Connection:
+    """
+    Opens a connection configured the way the rest of the app expects it.
+    Connections run in autocommit mode (isolation_level=None): a lone write is
+    committed by SQLite itself, and several writes are grouped explicitly
+    with transaction() instead of by sqlite3's implicit BEGIN.
+    """
+    conn = sqlite3.connect(
+        database,
+        check_same_thread=False,
+        cached_statements=CACHED_STATEMENTS,
+        isolation_level=None,
+    )
     conn.row_factory = sqlite3.Row # Allows accessing columns by name
-    conn.execute("PRAGMA foreign_keys = ON")
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class PoolTimeout(RuntimeError):
+    """Raised when no pooled connection is released within the timeout."""
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections shared by all requests."""
+
+    def __init__(self, database: str, size: int):
+        self.database = database
+        self.size = size
+        self._idle: queue.Queue = queue.Queue(maxsize=size)
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Fills the pool. Calling it again on an open pool does nothing."""
+        with self._lock:
+            while len(self._connections) < self.size:
+                conn = connect(self.database)
+                self._connections.append(conn)
+                self._idle.put(conn)
 
+    def acquire(self, timeout: Optional[float] = POOL_TIMEOUT_SECONDS) -> sqlite3.Connection:
+        """Takes an idle connection, waiting at most `timeout` seconds for one."""
+        if not self._connections:
+            self.open()
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No database connection became free within {timeout} seconds") from None
+
+    def release(self, conn: sqlite3.Connection):
+        # Never hand a half-finished transaction to the next request.
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                # SQLite's recommended upkeep: re-analyze tables whose
+                # statistics went stale during this connection's lifetime
+                conn.execute("PRAGMA optimize")
+                conn.close()
+            self._connections.clear()
+            self._idle = queue.Queue(maxsize=self.size)
+
+pool = ConnectionPool(DATABASE_URL, POOL_SIZE)
+atexit.register(pool.close)
+
+# Threads that wait in pool.acquire(), kept apart from the threadpool the
+# route handlers run on. If waiting requests could fill that threadpool, the
+# requests holding a connection would never get a thread to finish on, and
+# nothing would ever be released. The limiter is sized to the pool: more
+# waiting threads couldn't be served any sooner, so further requests queue on
+# it without holding a thread. One per event loop, like anyio's own default.
+_pool_wait_limiter: RunVar[anyio.CapacityLimiter] = RunVar("_pool_wait_limiter")
+
+def _get_pool_wait_limiter() -> anyio.CapacityLimiter:
+    try:
+        return _pool_wait_limiter.get()
+    except LookupError:
+        limiter = anyio.CapacityLimiter(POOL_SIZE)
+        _pool_wait_limiter.set(limiter)
+        return limiter
+
+async def get_db():
+    """Hands a request a pooled connection and returns it to the pool afterwards."""
+    conn = await anyio.to_thread.run_sync(pool.acquire, limiter=_get_pool_wait_limiter())
     try:
         yield conn
     finally:
-        conn.close()
+        pool.release(conn)
+
+# Callbacks waiting for the open transaction() block on a connection to commit
+_after_commit_callbacks: Dict[sqlite3.Connection, List[Callable[[], None]]] = {}
+
+def after_commit(db: sqlite3.Connection, callback: Callable[[], None]):
+    """
+    Runs callback once the current write is committed: when the enclosing
+    transaction() block commits, or right away if there is none (the write
+    has then already been committed). Dropped if the block rolls back.
+    """
+    callbacks = _after_commit_callbacks.get(db)
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+@contextmanager
+def transaction(db: sqlite3.Connection):
+    """
+    Groups several writes into a single BEGIN IMMEDIATE ... COMMIT, so they
+    cost one fsync instead of one each. CRUD functions called inside the block
+    leave committing to it, and everything is rolled back on error. A nested
+    block simply joins the outer transaction. Callbacks registered with
+    after_commit() run once the outermost block has committed. Works on autocommit connections
+    (as opened by connect()) as well as on sqlite3's default mode.
+    """
+    if db.isolation_level is None and db.in_transaction:
+        yield db
+        return
+
+    if db.in_transaction:
+        db.commit()
+    previous_isolation_level = db.isolation_level
+    db.isolation_level = None # Stop sqlite3 from opening/committing on its own
+    db.execute("BEGIN IMMEDIATE")
+    callbacks = _after_commit_callbacks[db] = []
+    try:
+        yield db
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+    else:
+        db.execute("COMMIT")
+        for callback in callbacks:
+            callback()
+    finally:
+        del _after_commit_callbacks[db]
+        db.isolation_level = previous_isolation_level
 
 def create_tables():
-    conn = sqlite3.connect(DATABASE_URL, check_same_thread=False)
+    conn = connect(DATABASE_URL)
     cursor = conn.cursor()
 
+    # Persistent; lets readers carry on while a write is in progress
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     # Create decks table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS decks (
@@ -64,7 +225,24 @@ def create_tables():
             FOREIGN KEY(card_id) REFERENCES cards(id) ON DELETE CASCADE
         );
     """)
-    
+
+    # Indices for the study queue and the daily counters. Without them every
+    # review step scans (and sorts) the whole cards table.
+    # introduction_date is carried along so the deck list's per-deck counters
+    # are answered from this index alone.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cards_deck_queue ON cards(deck_id, state, next_review_date, introduction_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cards_deck_state_id ON cards(deck_id, state, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cards_deck_intro ON cards(deck_id, introduction_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_cards_deck_next ON cards(deck_id, next_review_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_review_history_deck_ts ON review_history(deck_id, review_timestamp)")
+    # Give the planner statistics to pick between these indices with. A full
+    # ANALYZE (which scans every table) only runs on a database that has none
+    # yet; after that PRAGMA optimize re-analyzes just what has gone stale.
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None:
+        cursor.execute("ANALYZE")
+    else:
+        cursor.execute("PRAGMA optimize")
+
     # Table for app settings (unchanged)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS settings (
@@ -74,4 +252,7 @@ def create_tables():
         );
     """)
     conn.commit()
-    conn.close()
\ No newline at end of file
+    conn.close()
+
+    # Open the pooled connections now that the schema exists
+    pool.open()
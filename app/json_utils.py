@@ -0,0 +1,21 @@
+# app/json_utils.py
+
+import json
+
+# Card data is (de)serialized for every row read or written and for every deck
+# upload, so prefer orjson when it's installed. Both paths produce compact
+# UTF-8 JSON: no padding after separators and no \uXXXX escapes, which would
+# triple the size of kana/kanji. Decode errors are json.JSONDecodeError either
+# way (orjson's error subclasses it).
+try:
+    import orjson
+
+    loads = orjson.loads
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    loads = json.loads
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
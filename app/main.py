@@ -1,17 +1,22 @@
 from fastapi import FastAPI, Request, Depends, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from jinja2 import FileSystemBytecodeCache
 from pydantic import BaseModel
 
 import sqlite3
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import date, datetime
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Dict, Any, List, Tuple
 
-from app import crud, models
-from app.database import get_db, create_tables
-from app.srs_algorithm import sm2_algorithm
+from app import crud, models, json_utils
+from app.database import PoolTimeout, get_db, create_tables, transaction
+from app.srs_algorithm import sm2_algorithm, parse_learning_steps
 
 class CardPreviewRequest(BaseModel):
     template: str
@@ -24,19 +29,125 @@ class CardPreviewRequest(BaseModel):
 create_tables()
 app = FastAPI()
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/media", StaticFiles(directory="media"), name="media")
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that also sends Cache-Control, so the browser reuses an asset
+    (e.g. a card's audio or image, shown many times per study session) without
+    asking the server again until max_age runs out. ETag/Last-Modified
+    revalidation after that is handled by StaticFiles as before.
+    """
+
+    def __init__(self, *args, max_age: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = f"public, max-age={max_age}"
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
+
+# Asset names aren't content-hashed, so keep the lifetimes short enough for edits to show up
+app.mount("/static", CachedStaticFiles(directory="static", max_age=3600), name="static")
+app.mount("/media", CachedStaticFiles(directory="media", max_age=86400), name="media")
 templates = Jinja2Templates(directory="templates")
+# Keep compiled page templates on disk across restarts, and compile them all
+# now rather than on the first request that needs each one.
+templates.env.bytecode_cache = FileSystemBytecodeCache()
+for template_name in templates.env.list_templates():
+    templates.env.get_template(template_name)
+
+# --- Custom Jinja2 global function ---
+# Card templates are user-defined strings rendered on every study/preview
+# request; compile each distinct one only once. Unusually large strings are
+# compiled every time rather than pinned in the cache.
+MAX_CACHED_TEMPLATE_LENGTH = 64 * 1024
+
+@lru_cache(maxsize=256)
+def _compile_template_string(template_string: str):
+    return templates.env.from_string(template_string)
 
-# --- Custom Jinja2 global function (Unchanged) ---
 def render_template_string(template_string: str, **context) -> str:
-    template = templates.env.from_string(template_string)
-    return template.render(**context)
+    if len(template_string) > MAX_CACHED_TEMPLATE_LENGTH:
+        return templates.env.from_string(template_string).render(**context)
+    return _compile_template_string(template_string).render(**context)
 templates.env.globals['render_template_string'] = render_template_string
 # ---
 
+# --- Rendered page cache ---
+# The deck list and progress pages only change after a write, so their HTML is
+# reused for a few seconds. Every non-GET request bumps the generation, which
+# drops all cached pages (and stops pages rendered before the write finished
+# from being stored); the TTL bounds how far time-based counts, like learning
+# cards coming due, can lag behind.
+PAGE_CACHE_TTL_SECONDS = 10.0
+MAX_CACHED_PAGES = 64
+_page_cache: "OrderedDict[Tuple[Any, ...], Tuple[float, bytes]]" = OrderedDict()
+_page_cache_generation = 0
+_page_cache_lock = threading.Lock()
+
+def page_cache_key(*params: Any) -> Tuple[Any, ...]:
+    """
+    Builds a page cache key from a page name and its already parsed and
+    normalized parameters. The raw query string is never part of the key, so
+    made-up query strings can't each add an entry.
+    """
+    return (*params, date.today())
+
+def get_cached_page(key: Tuple[Any, ...]) -> Optional[HTMLResponse]:
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _page_cache[key]
+            return None
+    return HTMLResponse(content=entry[1])
+
+def cache_page(key: Tuple[Any, ...], generation: int, response: HTMLResponse) -> HTMLResponse:
+    with _page_cache_lock:
+        if generation == _page_cache_generation:
+            now = time.monotonic()
+            # Entries for pages nobody asks for again (e.g. an earlier day's) expire here
+            for expired_key in [k for k, (expires_at, _) in _page_cache.items() if expires_at < now]:
+                del _page_cache[expired_key]
+            _page_cache[key] = (now + PAGE_CACHE_TTL_SECONDS, response.body)
+            _page_cache.move_to_end(key)
+            while len(_page_cache) > MAX_CACHED_PAGES:
+                _page_cache.popitem(last=False)
+    return response
+
+def invalidate_page_cache():
+    global _page_cache_generation
+    with _page_cache_lock:
+        _page_cache_generation += 1
+        _page_cache.clear()
+
+class PageCacheInvalidationMiddleware:
+    """
+    Drops the cached pages after every non-GET request. A plain ASGI middleware
+    rather than @app.middleware("http"), so GETs, including every /static and
+    /media file, pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            invalidate_page_cache()
+
+app.add_middleware(PageCacheInvalidationMiddleware)
+
+# Routes that touch SQLite or render templates are plain `def`s: Starlette
+# runs those in its threadpool, so a slow query or render never blocks the
+# event loop (and with it every other request).
 @app.post("/preview_card", response_class=HTMLResponse)
-async def preview_card(request: Request, preview_request: CardPreviewRequest):
+def preview_card(request: Request, preview_request: CardPreviewRequest):
     """Renders a card preview based on template, CSS, and sample data."""
     # We create a dummy deck object to pass to the template renderer
     # This ensures {{ deck.media_folder }} works in the preview.
@@ -61,76 +172,82 @@ async def preview_card(request: Request, preview_request: CardPreviewRequest):
     """
     return HTMLResponse(content=full_html)
 
-# Dependency
-def get_database():
-    yield from get_db()
+# Dependency. Async on purpose: waiting for a free connection must not occupy
+# the threadpool the `def` routes below run on (see database.get_db).
+get_database = get_db
+
+@app.exception_handler(PoolTimeout)
+async def database_busy(request: Request, exc: PoolTimeout):
+    return PlainTextResponse("The server is busy, please try again.", status_code=503, headers={"Retry-After": "1"})
+
+def get_effective_settings(db: sqlite3.Connection, deck: models.Deck) -> Dict[str, Any]:
+    """
+    Returns the scheduling settings that apply to a deck: its own values where
+    set, the global ones otherwise. learning_steps comes back already parsed.
+    """
+    global_settings = crud.get_global_settings(db)
+    return {
+        "new_cards_per_day": deck.new_cards_per_day or int(global_settings["new_cards_per_day"]),
+        "max_reviews_per_day": deck.max_reviews_per_day or int(global_settings["max_reviews_per_day"]),
+        "learning_steps": parse_learning_steps(deck.learning_steps or global_settings["learning_steps"]),
+        "graduating_interval": deck.graduating_interval or int(global_settings["graduating_interval"]),
+    }
 
 @app.get("/", response_class=RedirectResponse)
 async def read_root():
     return RedirectResponse(url="/decks")
 
 @app.get("/decks", response_class=HTMLResponse)
-async def list_decks(request: Request, db: sqlite3.Connection = Depends(get_database)):
+def list_decks(request: Request, db: sqlite3.Connection = Depends(get_database)):
     """Displays a list of all created decks with their queue counts."""
-    decks_raw = crud.get_all_decks(db)
-    decks_with_counts = []
-    
-    # Get global settings as fallbacks
-    global_new_cards = int(crud.get_setting(db, "new_cards_per_day") or "5")
-    global_max_reviews = int(crud.get_setting(db, "max_reviews_per_day") or "20")
+    cache_key = page_cache_key("decks")
+    cached_page = get_cached_page(cache_key)
+    if cached_page is not None:
+        return cached_page
+    generation = _page_cache_generation
 
-    global_learning_steps = crud.get_setting(db, "learning_steps") or "10 1440" # Default as per sm2_algorithm
-    global_graduating_interval = int(crud.get_setting(db, "graduating_interval") or "4") # Default as per sm2_algorithm
+    decks_with_counts = crud.get_all_decks_with_stats(db)
     
-    for deck in decks_raw:
-        effective_new_cards = deck.new_cards_per_day or global_new_cards
-        effective_max_reviews = deck.max_reviews_per_day or global_max_reviews
-        reviews_done_today = crud.get_reviews_done_today(db, deck.id)
-        new_cards_rated_today = crud.get_new_cards_rated_today(db, deck.id)
-
-        counts = crud.get_queue_counts(db, deck.id, effective_new_cards)
-        total_card_count = crud.get_total_card_count_in_deck(db, deck.id)
+    # Get global settings as fallbacks
+    global_settings = crud.get_global_settings(db)
+    global_new_cards = int(global_settings["new_cards_per_day"])
+    global_max_reviews = int(global_settings["max_reviews_per_day"])
 
-        decks_with_counts.append({
-            "deck": deck,
-            "counts": counts,
-            "total_card_count": total_card_count,
-            "max_reviews_setting": effective_max_reviews,
-            "new_cards_per_day_setting": effective_new_cards,
-            "reviews_done_today": reviews_done_today,
-            "new_cards_rated_today": new_cards_rated_today
-        })
+    for item in decks_with_counts:
+        deck = item["deck"]
+        item["max_reviews_setting"] = deck.max_reviews_per_day or global_max_reviews
+        item["new_cards_per_day_setting"] = deck.new_cards_per_day or global_new_cards
 
-    return templates.TemplateResponse("decks.html", {"request": request, "decks_with_counts": decks_with_counts})
+    return cache_page(cache_key, generation, templates.TemplateResponse("decks.html", {"request": request, "decks_with_counts": decks_with_counts}))
 
 @app.get("/add_deck", response_class=HTMLResponse)
-async def add_deck_page(request: Request):
+def add_deck_page(request: Request):
     return templates.TemplateResponse("add_deck.html", {"request": request, "message": None, "error": None})
 
 
 @app.get("/decks/{deck_id}/edit_layout", response_class=HTMLResponse)
-async def edit_deck_layout_page(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def edit_deck_layout_page(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
     deck = crud.get_deck(db, deck_id)
     if not deck:
         return RedirectResponse(url="/decks")
 
     # Fetch the first card of the deck to use as sample data for the preview
-    all_cards = crud.get_all_cards_in_deck(db, deck_id)
-    sample_card_data = all_cards[0].data if all_cards else {"front": "Sample Front", "back": "Sample Back", "audio": "sample.mp3"}
+    sample_card = crud.get_first_card_in_deck(db, deck_id)
+    sample_card_data = sample_card.data if sample_card else {"front": "Sample Front", "back": "Sample Back", "audio": "sample.mp3"}
 
     return templates.TemplateResponse(
         "edit_deck_layout.html",
         {
             "request": request,
             "deck": deck,
-            "sample_card_json": json.dumps(sample_card_data),
+            "sample_card_json": json_utils.dumps(sample_card_data),
             "message": None,
             "error": None
         }
     )
 
 @app.post("/decks/{deck_id}/edit_layout", response_class=HTMLResponse)
-async def edit_deck_layout_submit(
+def edit_deck_layout_submit(
     request: Request,
     deck_id: int,
     card_template: str = Form(...),
@@ -141,30 +258,30 @@ async def edit_deck_layout_submit(
         updated_deck = crud.update_deck_layout(db, deck_id, card_template, card_css)
 
         # Refetch sample card data in case it's needed again
-        all_cards = crud.get_all_cards_in_deck(db, deck_id)
-        sample_card_data = all_cards[0].data if all_cards else {"front": "Sample Front", "back": "Sample Back"}
+        sample_card = crud.get_first_card_in_deck(db, deck_id)
+        sample_card_data = sample_card.data if sample_card else {"front": "Sample Front", "back": "Sample Back"}
 
         return templates.TemplateResponse(
             "edit_deck_layout.html",
             {
                 "request": request,
                 "deck": updated_deck,
-                "sample_card_json": json.dumps(sample_card_data),
+                "sample_card_json": json_utils.dumps(sample_card_data),
                 "message": "Deck layout updated successfully!",
                 "error": None
             }
         )
     except Exception as e:
         deck = crud.get_deck(db, deck_id)
-        all_cards = crud.get_all_cards_in_deck(db, deck_id)
-        sample_card_data = all_cards[0].data if all_cards else {"front": "Sample Front", "back": "Sample Back"}
+        sample_card = crud.get_first_card_in_deck(db, deck_id)
+        sample_card_data = sample_card.data if sample_card else {"front": "Sample Front", "back": "Sample Back"}
         error = f"An unexpected error occurred: {e}"
         return templates.TemplateResponse(
             "edit_deck_layout.html",
             {
                 "request": request,
                 "deck": deck,
-                "sample_card_json": json.dumps(sample_card_data),
+                "sample_card_json": json_utils.dumps(sample_card_data),
                 "message": None,
                 "error": error
             }
@@ -172,7 +289,7 @@ async def edit_deck_layout_submit(
 
 # add_deck_submit POST endpoint remains largely the same, no changes needed here.
 @app.post("/add_deck", response_class=HTMLResponse)
-async def add_deck_submit(
+def add_deck_submit(
     request: Request,
     name: str = Form(...),
     media_folder: str = Form(""),
@@ -186,16 +303,23 @@ async def add_deck_submit(
         media_folder_val = media_folder.strip() if media_folder else None
 
         new_deck_model = models.DeckCreate(name=name, media_folder=media_folder_val, card_template=card_template, card_css=card_css)
-        created_deck = crud.create_deck(db, new_deck_model)
-        contents = await deck_file.read()
-        cards_data = json.loads(contents)
-
-        if not isinstance(cards_data, list):
+        # Parse before taking the write lock. The raw upload isn't kept
+        # around once it's parsed.
+        cards_data = json_utils.loads(deck_file.file.read())
+
+        # CardCreate only requires `data` to be an object (JSON keys are
+        # always strings), so checking that here is its whole validation and
+        # the models below can be built without running Pydantic per card.
+        if not isinstance(cards_data, list) or not all(isinstance(card_item, dict) for card_item in cards_data):
             raise ValueError("JSON file must contain a list of card objects.")
 
-        for card_item in cards_data:
-            new_card_model = models.CardCreate(deck_id=created_deck.id, data=card_item)
-            crud.create_card(db, new_card_model)
+        # The deck and its cards are committed together, so a bad card
+        # doesn't leave a half-imported deck behind
+        with transaction(db):
+            created_deck = crud.create_deck(db, new_deck_model)
+            crud.create_cards_bulk(
+                db, (models.CardCreate.model_construct(deck_id=created_deck.id, data=card_item) for card_item in cards_data)
+            )
         return RedirectResponse(url="/decks", status_code=303)
     except sqlite3.IntegrityError:
         error = f"A deck with the name '{name}' already exists."
@@ -208,23 +332,21 @@ async def add_deck_submit(
         return templates.TemplateResponse("add_deck.html", {"request": request, "error": error, "name": name, "media_folder": media_folder, "card_template": card_template, "card_css": card_css})
 
 @app.get("/study/{deck_id}", response_class=HTMLResponse)
-async def study_deck(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def study_deck(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
     deck = crud.get_deck(db, deck_id)
     if not deck:
         return RedirectResponse(url="/decks")
 
     # Determine effective settings
-    global_new_cards = int(crud.get_setting(db, "new_cards_per_day") or "5")
-    global_max_reviews = int(crud.get_setting(db, "max_reviews_per_day") or "20")
-
-    global_learning_steps = crud.get_setting(db, "learning_steps") or "10 1440"
-    global_graduating_interval = int(crud.get_setting(db, "graduating_interval") or "4")
+    settings = get_effective_settings(db, deck)
+    effective_new_cards = settings["new_cards_per_day"]
+    effective_max_reviews = settings["max_reviews_per_day"]
 
-    effective_new_cards = deck.new_cards_per_day or global_new_cards
-    effective_max_reviews = deck.max_reviews_per_day or global_max_reviews
+    # Today's review count, the next card and the queue counts in one query
+    study_context = crud.get_study_context(db, deck_id, effective_new_cards)
 
     # --- NEW DATABASE-DRIVEN GATEKEEPER ---
-    reviews_done_today = crud.get_reviews_done_today(db, deck_id)
+    reviews_done_today = study_context["reviews_done_today"]
 
     if reviews_done_today >= effective_max_reviews:
         return templates.TemplateResponse(
@@ -234,11 +356,8 @@ async def study_deck(request: Request, deck_id: int, db: sqlite3.Connection = De
             })
     # --- END OF NEW GATEKEEPER ---
 
-    # Get the next card dynamically
-    current_card = crud.get_next_card_for_review(db, deck_id, effective_new_cards, effective_max_reviews)
-    
-    # Get current queue counts for display
-    queue_counts = crud.get_queue_counts(db, deck_id, effective_new_cards)
+    current_card = study_context["next_card"]
+    queue_counts = study_context["queue_counts"]
     
     if not current_card:
         return templates.TemplateResponse(
@@ -254,7 +373,7 @@ async def study_deck(request: Request, deck_id: int, db: sqlite3.Connection = De
         })
 
 @app.post("/submit_review/{deck_id}", response_class=RedirectResponse)
-async def submit_review(
+def submit_review(
     deck_id: int,
     card_id: int = Form(...),
     quality: int = Form(...),
@@ -263,37 +382,30 @@ async def submit_review(
     card = crud.get_card(db, card_id)
 
     if card:
-        # --- LOG THE REVIEW ACTION IN THE DATABASE ---
-        crud.log_review(db, deck_id=deck_id, card_id=card_id, quality=quality)
-
         deck = crud.get_deck(db, deck_id)
         # Get effective settings for the algorithm
-        global_steps_str = crud.get_setting(db, "learning_steps") or "10 1440"
-        global_grad_interval = int(crud.get_setting(db, "graduating_interval") or "4")
-        effective_steps_str = deck.learning_steps or global_steps_str
-        effective_grad_interval = deck.graduating_interval or global_grad_interval
-        learning_steps = [int(step) for step in effective_steps_str.split()]
+        settings = get_effective_settings(db, deck)
 
         # Run the algorithm to get the card's new state
-        updated_card_model = sm2_algorithm(card, quality, learning_steps, effective_grad_interval)
-        
-        # Persist the changes to the database
-        crud.update_card_review_data(db, updated_card_model)
+        updated_card_model = sm2_algorithm(card, quality, settings["learning_steps"], settings["graduating_interval"])
+
+        # Log the review and persist the new card state in one transaction (one fsync)
+        with transaction(db):
+            crud.log_review(db, deck_id=deck_id, card_id=card_id, quality=quality)
+            crud.update_card_review_data(db, updated_card_model)
 
     # Redirect back to the study page, which will dynamically pull the next card
     return RedirectResponse(url=f"/study/{deck_id}", status_code=303)        
 
 
 @app.get("/decks/{deck_id}/browse", response_class=HTMLResponse)
-async def browse_deck_cards(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def browse_deck_cards(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
     deck = crud.get_deck(db, deck_id)
     if not deck:
         return RedirectResponse(url="/decks")
     
-    all_cards = crud.get_all_cards_in_deck(db, deck_id)
-    
-    # Sort cards by their creation ID by default
-    all_cards_sorted = sorted(all_cards, key=lambda c: c.id)
+    # Cards come back sorted by their creation ID
+    all_cards_sorted = crud.get_all_cards_in_deck(db, deck_id, order_by="id")
 
     return templates.TemplateResponse(
         "browse_deck.html",
@@ -305,7 +417,7 @@ async def browse_deck_cards(request: Request, deck_id: int, db: sqlite3.Connecti
     )
 
 @app.post("/card/{card_id}/edit")
-async def edit_card_data(
+def edit_card_data(
     card_id: int,
     deck_id: int = Form(...),
     card_data_json: str = Form(...),
@@ -313,7 +425,7 @@ async def edit_card_data(
 ):
     try:
         # Validate that the submitted string is valid JSON
-        new_data = json.loads(card_data_json)
+        new_data = json_utils.loads(card_data_json)
         crud.update_card_data(db, card_id, new_data)
         return JSONResponse(content={
             "status": "success", 
@@ -332,7 +444,7 @@ async def edit_card_data(
         })
 
 @app.post("/card/{card_id}/delete")
-async def delete_card_submit(
+def delete_card_submit(
     card_id: int,
     deck_id: int = Form(...),
     db: sqlite3.Connection = Depends(get_database)
@@ -355,27 +467,52 @@ async def delete_card_submit(
             "message": f"An unexpected server error occurred: {e}"
         })
 
+# Cards listed per page of the progress table
+PROGRESS_PAGE_SIZE = 200
+
 @app.get("/progress/{deck_id}", response_class=HTMLResponse)
-async def deck_progress(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def deck_progress(request: Request, deck_id: int, page: int = 1, db: sqlite3.Connection = Depends(get_database)):
+    generation = _page_cache_generation
     deck = crud.get_deck(db, deck_id)
     if not deck:
         return RedirectResponse(url="/decks")
-    all_cards = crud.get_all_cards_in_deck(db, deck_id)
-    all_cards_sorted = sorted(all_cards, key=lambda c: c.next_review_date)
-    return templates.TemplateResponse("progress_deck.html", {"request": request, "deck": deck, "all_cards": all_cards_sorted})
+    total_cards = crud.get_total_card_count_in_deck(db, deck_id)
+    page_count = max(1, -(-total_cards // PROGRESS_PAGE_SIZE))
+    page = min(max(page, 1), page_count)
+
+    cache_key = page_cache_key("progress", deck_id, page)
+    cached_page = get_cached_page(cache_key)
+    if cached_page is not None:
+        return cached_page
+    cards_on_page = crud.get_all_cards_in_deck(
+        db, deck_id, order_by="next_review_date",
+        limit=PROGRESS_PAGE_SIZE, offset=(page - 1) * PROGRESS_PAGE_SIZE
+    )
+    return cache_page(cache_key, generation, templates.TemplateResponse(
+        "progress_deck.html",
+        {
+            "request": request,
+            "deck": deck,
+            "all_cards": cards_on_page,
+            "page": page,
+            "page_count": page_count,
+            "total_cards": total_cards,
+        }
+    ))
 
 @app.get("/settings/{deck_id}", response_class=HTMLResponse)
-async def deck_settings_page(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def deck_settings_page(request: Request, deck_id: int, db: sqlite3.Connection = Depends(get_database)):
     deck = crud.get_deck(db, deck_id)
 
     if not deck:
         return RedirectResponse(url="/decks")
 
-    global_new = crud.get_setting(db, "new_cards_per_day") or "5"
-    global_max = crud.get_setting(db, "max_reviews_per_day") or "20"
+    global_settings = crud.get_global_settings(db)
+    global_new = global_settings["new_cards_per_day"]
+    global_max = global_settings["max_reviews_per_day"]
 
-    global_learning_steps = crud.get_setting(db, "learning_steps") or "10 1440"
-    global_graduating_interval = int(crud.get_setting(db, "graduating_interval") or "4")
+    global_learning_steps = global_settings["learning_steps"]
+    global_graduating_interval = int(global_settings["graduating_interval"])
 
     return templates.TemplateResponse(
         "settings_deck.html",
@@ -392,7 +529,7 @@ async def deck_settings_page(request: Request, deck_id: int, db: sqlite3.Connect
     )
 
 @app.post("/settings/{deck_id}", response_class=HTMLResponse)
-async def update_deck_settings_submit(
+def update_deck_settings_submit(
     request: Request,
     deck_id: int,
     name: str = Form(...),
@@ -425,10 +562,11 @@ async def update_deck_settings_submit(
 
     # Refetch data to display on the page
     deck = crud.get_deck(db, deck_id)
-    global_new = crud.get_setting(db, "new_cards_per_day") or "5"
-    global_max = crud.get_setting(db, "max_reviews_per_day") or "20"
-    global_learning_steps = crud.get_setting(db, "learning_steps") or "10 1440"
-    global_graduating_interval = int(crud.get_setting(db, "graduating_interval") or "4")
+    global_settings = crud.get_global_settings(db)
+    global_new = global_settings["new_cards_per_day"]
+    global_max = global_settings["max_reviews_per_day"]
+    global_learning_steps = global_settings["learning_steps"]
+    global_graduating_interval = int(global_settings["graduating_interval"])
 
     return templates.TemplateResponse(
         "settings_deck.html",
@@ -445,17 +583,18 @@ async def update_deck_settings_submit(
     )
 
 @app.post("/delete_deck/{deck_id}", response_class=RedirectResponse)
-async def delete_deck_submit(deck_id: int, db: sqlite3.Connection = Depends(get_database)):
+def delete_deck_submit(deck_id: int, db: sqlite3.Connection = Depends(get_database)):
     crud.delete_deck(db, deck_id)
     return RedirectResponse(url="/decks", status_code=303)
 
 @app.get("/settings", response_class=HTMLResponse)
-async def settings_page(request: Request, db: sqlite3.Connection = Depends(get_database)):
-    current_new_cards_per_day = crud.get_setting(db, "new_cards_per_day") or "5"
-    current_max_reviews_per_day = crud.get_setting(db, "max_reviews_per_day") or "20"
+def settings_page(request: Request, db: sqlite3.Connection = Depends(get_database)):
+    global_settings = crud.get_global_settings(db)
+    current_new_cards_per_day = global_settings["new_cards_per_day"]
+    current_max_reviews_per_day = global_settings["max_reviews_per_day"]
 
-    current_learning_steps = crud.get_setting(db, "learning_steps") or "10 1440"
-    current_graduating_interval = crud.get_setting(db, "graduating_interval") or "4"
+    current_learning_steps = global_settings["learning_steps"]
+    current_graduating_interval = global_settings["graduating_interval"]
 
     return templates.TemplateResponse(
         "settings.html",
@@ -470,7 +609,7 @@ async def settings_page(request: Request, db: sqlite3.Connection = Depends(get_d
     )
 
 @app.post("/settings", response_class=HTMLResponse)
-async def update_settings(
+def update_settings(
     request: Request,
     new_cards_per_day: int = Form(...),
     max_reviews_per_day: int = Form(...),
@@ -478,11 +617,12 @@ async def update_settings(
     graduating_interval: int = Form(...),
     db: sqlite3.Connection = Depends(get_database)
 ):
-    crud.set_setting(db, "new_cards_per_day", str(new_cards_per_day))
-    crud.set_setting(db, "max_reviews_per_day", str(max_reviews_per_day))
-
-    crud.set_setting(db, "learning_steps", learning_steps)
-    crud.set_setting(db, "graduating_interval", str(graduating_interval))
+    crud.set_settings_bulk(db, [
+        ("new_cards_per_day", str(new_cards_per_day)),
+        ("max_reviews_per_day", str(max_reviews_per_day)),
+        ("learning_steps", learning_steps),
+        ("graduating_interval", str(graduating_interval)),
+    ])
 
     message = "Settings updated successfully!"
     return templates.TemplateResponse(
@@ -1,23 +1,48 @@
 # app/srs_algorithm.py
 from datetime import datetime, timedelta, date
-from typing import List
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
 from app.models import Card
 
+@lru_cache(maxsize=64)
+def parse_learning_steps(learning_steps: str) -> Tuple[int, ...]:
+    """Parses a learning steps setting such as "10 1440" into minutes. Memoized,
+    since every review submission parses one of a handful of strings."""
+    return tuple(int(step) for step in learning_steps.split())
+
+def _sm2_ease_factor_delta(quality: int) -> float:
+    """SM-2's ease factor adjustment for a review of the given quality."""
+    return 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+
+# The adjustment for each quality rating, computed once
+_EASE_FACTOR_DELTAS = {q: _sm2_ease_factor_delta(q) for q in range(6)}
+
+def ease_factor_delta(quality: int) -> float:
+    """Returns how much a review of the given quality changes the ease factor."""
+    delta = _EASE_FACTOR_DELTAS.get(quality)
+    if delta is None:
+        delta = _sm2_ease_factor_delta(quality)
+    return delta
+
 def sm2_algorithm(
     card: Card,
     quality: int,
-    learning_steps_minutes: List[int],
-    graduating_interval_days: int
+    learning_steps_minutes: Sequence[int],
+    graduating_interval_days: int,
+    now: Optional[datetime] = None
 ) -> Card:
     """
     Implements a modified SM-2 algorithm that manages card state.
     quality: 0-2 (Hard/Incorrect), 3 (Good), 4-5 (Easy)
+    now: the review time; defaults to datetime.now(), read once per call.
     """
-    card.last_reviewed_date = datetime.now()
+    if now is None:
+        now = datetime.now()
+    card.last_reviewed_date = now
 
     # If this is the card's first-ever review, stamp its introduction date.
     if card.state == 'new':
-        card.introduction_date = date.today()
+        card.introduction_date = now.date()
 
     if quality < 3:  # --- Incorrect Answer (Lapse) ---
         card.reviews += 1 # A lapse is still a review
@@ -30,7 +55,7 @@ def sm2_algorithm(
         
         # Reset to the first learning step
         interval_minutes = learning_steps_minutes[0] if learning_steps_minutes else 10
-        card.next_review_date = datetime.now() + timedelta(minutes=interval_minutes)
+        card.next_review_date = now + timedelta(minutes=interval_minutes)
 
     else:  # --- Correct Answer ---
         card.reviews += 1
@@ -40,13 +65,13 @@ def sm2_algorithm(
             # If there are more learning steps, use the next one
             if card.learning_step < len(learning_steps_minutes):
                 interval_minutes = learning_steps_minutes[card.learning_step]
-                card.next_review_date = datetime.now() + timedelta(minutes=interval_minutes)
+                card.next_review_date = now + timedelta(minutes=interval_minutes)
                 card.learning_step += 1
             # Otherwise, the card graduates
             else:
                 card.state = 'review'
                 card.interval_days = graduating_interval_days
-                card.next_review_date = datetime.now() + timedelta(days=graduating_interval_days)
+                card.next_review_date = now + timedelta(days=graduating_interval_days)
                 # card.interval_days = graduating_interval_days
                 # card.next_review_date = datetime.now() + timedelta(minutes=graduating_interval_days)
         
@@ -58,11 +83,9 @@ def sm2_algorithm(
                 card.interval_days = round(card.interval_days * card.ease_factor)
             
             # Update ease factor (only for graduated cards)
-            card.ease_factor += (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-            if card.ease_factor < 1.3:
-                card.ease_factor = 1.3
+            card.ease_factor = max(card.ease_factor + ease_factor_delta(quality), 1.3)
             
-            card.next_review_date = datetime.now() + timedelta(days=int(card.interval_days))
+            card.next_review_date = now + timedelta(days=int(card.interval_days))
             # card.next_review_date = datetime.now() + timedelta(minutes=card.interval_days)
 
     return card
\ No newline at end of file
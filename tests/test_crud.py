@@ -8,45 +8,99 @@ from datetime import datetime, date, timedelta
 
 # This assumes your project root is in the Python path.
 from app import crud, models
-from app.database import create_tables
+from app.database import CONNECTION_PRAGMAS, ConnectionPool, PoolTimeout, create_tables, transaction
+
+# Mirrors the tables created by database.create_tables()
+SCHEMA_SQL = """
+CREATE TABLE decks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, card_template TEXT NOT NULL,
+    card_css TEXT NOT NULL, media_folder TEXT, new_cards_per_day INTEGER, max_reviews_per_day INTEGER,
+    learning_steps TEXT, graduating_interval INTEGER
+);
+CREATE TABLE cards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, deck_id INTEGER NOT NULL, data TEXT NOT NULL,
+    next_review_date TEXT, interval_days REAL DEFAULT 0.0, ease_factor REAL DEFAULT 2.5,
+    reviews INTEGER DEFAULT 0, last_reviewed_date TEXT, state TEXT NOT NULL DEFAULT 'new',
+    learning_step INTEGER NOT NULL DEFAULT 0, introduction_date TEXT,
+    FOREIGN KEY(deck_id) REFERENCES decks(id) ON DELETE CASCADE
+);
+CREATE TABLE review_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, deck_id INTEGER NOT NULL, card_id INTEGER NOT NULL,
+    review_timestamp TEXT NOT NULL, quality INTEGER NOT NULL,
+    FOREIGN KEY(deck_id) REFERENCES decks(id) ON DELETE CASCADE,
+    FOREIGN KEY(card_id) REFERENCES cards(id) ON DELETE CASCADE
+);
+CREATE TABLE settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, setting_name TEXT NOT NULL UNIQUE, setting_value TEXT NOT NULL
+);
+"""
+
+class FrozenDatetime(datetime):
+    """Stands in for crud's `datetime`: now() returns whatever the test set."""
+    frozen_now = None
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.frozen_now
+
+class FrozenDate(date):
+    """Stands in for crud's `date`: today() returns whatever the test set."""
+    frozen_today = None
+
+    @classmethod
+    def today(cls):
+        return cls.frozen_today
 
 class TestCRUD(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        """Build the schema and the sample deck once; each test gets a copy of this database."""
+        cls.template_db = sqlite3.connect(":memory:")
+        cls.template_db.executescript(SCHEMA_SQL)
+        cls.template_db.execute("INSERT INTO decks (id, name, card_template, card_css) VALUES (1, 'Deck 1', 't', 'c')")
+        cls.template_db.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.template_db.close()
+
     def setUp(self):
         """Set up an in-memory database for each test."""
         self.db = sqlite3.connect(":memory:")
+        # A page-level copy of the template, without re-running the DDL
+        self.template_db.backup(self.db)
         self.db.row_factory = sqlite3.Row
-        self.db.execute("PRAGMA foreign_keys = ON")
-        # Create tables from the schema in database.py
-        create_tables_sql = """
-        CREATE TABLE decks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL UNIQUE, card_template TEXT NOT NULL,
-            card_css TEXT NOT NULL, media_folder TEXT, new_cards_per_day INTEGER, max_reviews_per_day INTEGER,
-            learning_steps TEXT, graduating_interval INTEGER
-        );
-        CREATE TABLE cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, deck_id INTEGER NOT NULL, data TEXT NOT NULL,
-            next_review_date TEXT, interval_days REAL DEFAULT 0.0, ease_factor REAL DEFAULT 2.5,
-            reviews INTEGER DEFAULT 0, last_reviewed_date TEXT, state TEXT NOT NULL DEFAULT 'new',
-            learning_step INTEGER NOT NULL DEFAULT 0, introduction_date TEXT,
-            FOREIGN KEY(deck_id) REFERENCES decks(id) ON DELETE CASCADE
-        );
-        CREATE TABLE review_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT, deck_id INTEGER NOT NULL, card_id INTEGER NOT NULL,
-            review_timestamp TEXT NOT NULL, quality INTEGER NOT NULL,
-            FOREIGN KEY(deck_id) REFERENCES decks(id) ON DELETE CASCADE,
-            FOREIGN KEY(card_id) REFERENCES cards(id) ON DELETE CASCADE
-        );
-        """
-        self.db.executescript(create_tables_sql)
-
-        # Create a sample deck for card tests
-        self.deck1 = crud.create_deck(self.db, models.DeckCreate(name="Deck 1", card_template="t", card_css="c"))
+        # Same per-connection settings as the app's connections (foreign keys,
+        # synchronous=NORMAL, ...); journal_mode doesn't apply to :memory:
+        for pragma in CONNECTION_PRAGMAS:
+            self.db.execute(pragma)
+        # Every test starts from a fresh database, so nothing cached may carry over
+        crud.clear_caches()
+
+        # crud's clock is patched for every test and starts at the real current
+        # time; tests that need a fixed date set now()/today() themselves
+        real_now = datetime.now()
+        FrozenDatetime.frozen_now = real_now
+        FrozenDate.frozen_today = real_now.date()
+        for patcher in (patch('app.crud.datetime', FrozenDatetime), patch('app.crud.date', FrozenDate)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # The sample deck for card tests is already in the copied database
+        self.deck1 = models.Deck(id=1, name="Deck 1", card_template="t", card_css="c")
 
     def tearDown(self):
         """Close the database connection after each test."""
         self.db.close()
 
+    def _seed_card(self, data, state='new', due=None, intro=None) -> int:
+        """Inserts a fixture card into deck 1 with a single INSERT and returns its id."""
+        return self.db.execute(
+            "INSERT INTO cards (deck_id, data, state, next_review_date, introduction_date) VALUES (?, ?, ?, ?, ?)",
+            (self.deck1.id, json.dumps(data), state, due.isoformat() if due else None, intro.isoformat() if intro else None)
+        ).lastrowid
+
     # --- Deck Tests ---
     def test_create_and_get_deck(self):
         deck_model = models.DeckCreate(name="Test Deck", card_template="<p>Q</p>", card_css="p {color: red;}")
@@ -67,6 +121,114 @@ class TestCRUD(unittest.TestCase):
         self.assertIsNone(crud.get_deck(self.db, self.deck1.id))
         self.assertIsNone(crud.get_card(self.db, created_card.id))
 
+    def test_deck_cache_invalidated_on_write(self):
+        """Test that cached decks are refreshed after they are updated or deleted."""
+        self.assertEqual(crud.get_deck(self.db, self.deck1.id).name, "Deck 1")
+
+        crud.update_deck_settings(self.db, self.deck1.id, "Renamed", None, 10, None, None, None)
+        deck = crud.get_deck(self.db, self.deck1.id)
+        self.assertEqual(deck.name, "Renamed")
+        self.assertEqual(deck.new_cards_per_day, 10)
+
+        crud.update_deck_layout(self.db, self.deck1.id, "<p>new</p>", "p {}")
+        self.assertEqual(crud.get_deck(self.db, self.deck1.id).card_template, "<p>new</p>")
+
+        crud.delete_deck(self.db, self.deck1.id)
+        self.assertIsNone(crud.get_deck(self.db, self.deck1.id))
+
+    def test_deck_cache_is_bounded(self):
+        """Test that missing decks aren't cached and the cache evicts its oldest entries."""
+        for deck_id in range(1000, 1000 + 2 * crud._deck_cache.maxsize):
+            self.assertIsNone(crud.get_deck(self.db, deck_id))
+        self.assertEqual(len(crud._deck_cache._entries), 0)
+
+        cache = crud._TTLCache(60, maxsize=2)
+        for key in ("a", "b", "c"):
+            cache.set(self.db, key, key)
+        self.assertEqual(list(cache._entries), ["b", "c"])
+        cache.get("b") # Recently used entries are evicted last
+        cache.set(self.db, "d", "d")
+        self.assertEqual(list(cache._entries), ["b", "d"])
+
+    def test_cache_invalidated_after_commit(self):
+        """Test that a value re-cached by another connection before COMMIT is still dropped."""
+        other_connection = sqlite3.connect(":memory:") # Not in a transaction, so it may cache
+        self.addCleanup(other_connection.close)
+        old_deck = crud.get_deck(self.db, self.deck1.id)
+
+        with transaction(self.db):
+            crud.update_deck_settings(self.db, self.deck1.id, "Renamed", None, None, None, None, None)
+            crud.set_setting(self.db, "new_cards_per_day", "7")
+            # Another request reads the old committed rows meanwhile and caches them
+            crud._deck_cache.set(other_connection, self.deck1.id, old_deck)
+            crud._settings_cache.set(other_connection, "new_cards_per_day", None)
+
+        self.assertEqual(crud.get_deck(self.db, self.deck1.id).name, "Renamed")
+        self.assertEqual(crud.get_setting(self.db, "new_cards_per_day"), "7")
+
+    def test_cache_kept_after_rollback(self):
+        """Test that a rolled back write leaves the cache alone."""
+        crud.get_deck(self.db, self.deck1.id)
+        with self.assertRaises(RuntimeError):
+            with transaction(self.db):
+                crud.update_deck_settings(self.db, self.deck1.id, "Renamed", None, None, None, None, None)
+                raise RuntimeError("abort")
+        self.assertEqual(crud.get_deck(self.db, self.deck1.id).name, "Deck 1")
+
+    # --- Settings Tests ---
+    def test_setting_cache_invalidated_on_write(self):
+        """Test that get_setting and get_all_settings see values written by set_setting."""
+        self.assertIsNone(crud.get_setting(self.db, "new_cards_per_day"))
+        self.assertEqual(crud.get_all_settings(self.db), [])
+
+        crud.set_setting(self.db, "new_cards_per_day", "7")
+        self.assertEqual(crud.get_setting(self.db, "new_cards_per_day"), "7")
+
+        crud.set_setting(self.db, "new_cards_per_day", "9")
+        self.assertEqual(crud.get_setting(self.db, "new_cards_per_day"), "9")
+        # Overwriting a setting updates its row instead of adding another
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM settings").fetchone()[0], 1)
+        self.assertEqual(
+            [(s.setting_name, s.setting_value) for s in crud.get_all_settings(self.db)],
+            [("new_cards_per_day", "9")]
+        )
+
+    def test_get_all_settings_dict(self):
+        """Test that settings are returned as a plain name -> value mapping."""
+        self.assertEqual(crud.get_all_settings_dict(self.db), {})
+
+        crud.set_setting(self.db, "new_cards_per_day", "5")
+        crud.set_setting(self.db, "learning_steps", "10 1440")
+        settings = crud.get_all_settings_dict(self.db)
+        self.assertEqual(settings, {"new_cards_per_day": "5", "learning_steps": "10 1440"})
+
+        # Callers get their own copy, so mutating it can't corrupt the cache
+        settings["learning_steps"] = "1"
+        self.assertEqual(crud.get_all_settings_dict(self.db)["learning_steps"], "10 1440")
+
+    def test_set_settings_bulk(self):
+        """Test that several settings are saved at once and cached reads see them."""
+        crud.set_setting(self.db, "learning_steps", "1 10")
+        self.assertEqual(crud.get_setting(self.db, "learning_steps"), "1 10")
+
+        crud.set_settings_bulk(self.db, [("learning_steps", "10 1440"), ("graduating_interval", "3")])
+        self.assertEqual(crud.get_setting(self.db, "learning_steps"), "10 1440")
+        self.assertEqual(
+            crud.get_all_settings_dict(self.db),
+            {"learning_steps": "10 1440", "graduating_interval": "3"}
+        )
+
+    def test_get_global_settings_defaults(self):
+        """Test that missing or empty global settings fall back to their defaults."""
+        self.assertEqual(crud.get_global_settings(self.db), crud.DEFAULT_SETTINGS)
+
+        crud.set_setting(self.db, "new_cards_per_day", "12")
+        crud.set_setting(self.db, "learning_steps", "")
+        settings = crud.get_global_settings(self.db)
+        self.assertEqual(settings["new_cards_per_day"], "12")
+        self.assertEqual(settings["learning_steps"], "10 1440")
+        self.assertEqual(settings["max_reviews_per_day"], "20")
+
     # --- Card Tests ---
     def test_create_and_get_card(self):
         card_model = models.CardCreate(deck_id=self.deck1.id, data={"question": "What is FastAPI?", "answer": "A framework."})
@@ -78,31 +240,100 @@ class TestCRUD(unittest.TestCase):
         retrieved_card = crud.get_card(self.db, created_card.id)
         self.assertEqual(retrieved_card.id, created_card.id)
 
+    def test_get_all_cards_in_deck(self):
+        """Test that every card of a deck is returned with its data deserialized."""
+        other_deck = crud.create_deck(self.db, models.DeckCreate(name="Deck 2", card_template="t", card_css="c"))
+        crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "1"}))
+        crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "2"}))
+        crud.create_card(self.db, models.CardCreate(deck_id=other_deck.id, data={"q": "other"}))
+
+        cards = crud.get_all_cards_in_deck(self.db, self.deck1.id)
+        self.assertEqual(sorted(card.data["q"] for card in cards), ["1", "2"])
+        self.assertTrue(all(isinstance(card, models.Card) for card in cards))
+
+    def test_get_all_cards_in_deck_ordering(self):
+        """Test that cards can be listed by creation order or by due date."""
+        now = datetime(2023, 10, 27, 12, 0, 0)
+        cards = []
+        for days in (2, 0, 1):
+            card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"due_in": days}))
+            card.next_review_date = now + timedelta(days=days)
+            cards.append(crud.update_card_review_data(self.db, card))
+
+        by_id = crud.get_all_cards_in_deck(self.db, self.deck1.id)
+        self.assertEqual([card.id for card in by_id], sorted(card.id for card in cards))
+        by_due = crud.get_all_cards_in_deck(self.db, self.deck1.id, order_by="next_review_date")
+        self.assertEqual([card.data["due_in"] for card in by_due], [0, 1, 2])
+
+        page = crud.get_all_cards_in_deck(self.db, self.deck1.id, order_by="next_review_date", limit=2, offset=1)
+        self.assertEqual([card.data["due_in"] for card in page], [1, 2])
+
+    def test_get_first_card_in_deck(self):
+        """Test that the oldest card of a deck is returned, or None for an empty deck."""
+        self.assertIsNone(crud.get_first_card_in_deck(self.db, self.deck1.id))
+        first = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "1"}))
+        crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "2"}))
+        self.assertEqual(crud.get_first_card_in_deck(self.db, self.deck1.id), first)
+
+    def test_create_cards_bulk(self):
+        """Test that a batch of cards is inserted in one call, and nothing is inserted if one fails."""
+        count = crud.create_cards_bulk(
+            self.db, (models.CardCreate(deck_id=self.deck1.id, data={"q": str(i)}) for i in range(3))
+        )
+        self.assertEqual(count, 3)
+        cards = crud.get_all_cards_in_deck(self.db, self.deck1.id)
+        self.assertEqual(sorted(card.data["q"] for card in cards), ["0", "1", "2"])
+        self.assertTrue(all(card.state == 'new' for card in cards))
+
+        # The second card violates the foreign key, so the whole batch is rolled back
+        with self.assertRaises(sqlite3.IntegrityError):
+            crud.create_cards_bulk(self.db, [
+                models.CardCreate(deck_id=self.deck1.id, data={"q": "ok"}),
+                models.CardCreate(deck_id=999, data={"q": "bad"}),
+            ])
+        self.assertEqual(crud.get_total_card_count_in_deck(self.db, self.deck1.id), 3)
+
+    def test_update_card_data(self):
+        """Test that updating a card's data returns the stored card, or None if it doesn't exist."""
+        card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "old"}))
+
+        updated_card = crud.update_card_data(self.db, card.id, {"q": "new"})
+        self.assertEqual(updated_card.id, card.id)
+        self.assertEqual(updated_card.data, {"q": "new"})
+        self.assertEqual(crud.get_card(self.db, card.id).data, {"q": "new"})
+
+        self.assertIsNone(crud.update_card_data(self.db, 999, {"q": "missing"}))
+
+    def test_card_rows_are_parsed(self):
+        """Test that cards read back from the database carry proper date/datetime values."""
+        card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "日本"}))
+        card.last_reviewed_date = datetime(2023, 10, 27, 12, 0, 0)
+        card.introduction_date = date(2023, 10, 27)
+        crud.update_card_review_data(self.db, card)
+
+        for stored in (crud.get_card(self.db, card.id), crud.get_all_cards_in_deck(self.db, self.deck1.id)[0]):
+            self.assertIsInstance(stored.next_review_date, datetime)
+            self.assertEqual(stored.last_reviewed_date, datetime(2023, 10, 27, 12, 0, 0))
+            self.assertEqual(stored.introduction_date, date(2023, 10, 27))
+            self.assertEqual(stored.data, {"q": "日本"})
+
     # --- Queue and Review Logic Tests ---
-    @patch('app.crud.date')
-    @patch('app.crud.datetime')
-    def test_get_next_card_for_review_priority(self, mock_datetime, mock_date):
+    def test_get_next_card_for_review_priority(self):
         """Test the priority: Learning > Review > New."""
         FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
-        mock_datetime.now.return_value = FROZEN_TIME
-        mock_date.today.return_value = FROZEN_TIME.date()
-
-        # 1. Create a "New" card (lowest priority)
-        new_card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "new"}))
-        new_card.state = 'new'
-        crud.update_card_review_data(self.db, new_card)
-
-        # 2. Create a "Review" card due today (medium priority)
-        review_card_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "review"}))
-        review_card_model.state = 'review'
-        review_card_model.next_review_date = FROZEN_TIME - timedelta(days=1)
-        review_card = crud.update_card_review_data(self.db, review_card_model)
-
-        # 3. Create a "Learning" card due now (highest priority)
-        learning_card_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "learning"}))
-        learning_card_model.state = 'learning'
-        learning_card_model.next_review_date = FROZEN_TIME - timedelta(minutes=5)
-        learning_card = crud.update_card_review_data(self.db, learning_card_model)
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        FrozenDate.frozen_today = FROZEN_TIME.date()
+
+        # Build the fixture cards in a single transaction
+        with transaction(self.db):
+            # 1. A "New" card (lowest priority)
+            new_card_id = self._seed_card({"card": "new"}, due=FROZEN_TIME)
+            # 2. A "Review" card due today (medium priority)
+            review_card_id = self._seed_card({"card": "review"}, 'review', due=FROZEN_TIME - timedelta(days=1))
+            # 3. A "Learning" card due now (highest priority)
+            learning_card_id = self._seed_card({"card": "learning"}, 'learning', due=FROZEN_TIME - timedelta(minutes=5))
+        review_card = crud.get_card(self.db, review_card_id)
+        learning_card = crud.get_card(self.db, learning_card_id)
 
         # Fetch next card - should be the learning card
         next_card = crud.get_next_card_for_review(self.db, self.deck1.id, new_card_limit=5, total_limit=20)
@@ -122,13 +353,12 @@ class TestCRUD(unittest.TestCase):
 
         # Fetch next card - should be the new card
         next_card = crud.get_next_card_for_review(self.db, self.deck1.id, new_card_limit=5, total_limit=20)
-        self.assertEqual(next_card.id, new_card.id)
+        self.assertEqual(next_card.id, new_card_id)
 
-    @patch('app.crud.date')
-    def test_get_next_card_new_limit_reached(self, mock_date):
+    def test_get_next_card_new_limit_reached(self):
         """Test that no new card is returned if the daily limit is met."""
         FROZEN_DATE = date(2023, 10, 27)
-        mock_date.today.return_value = FROZEN_DATE
+        FrozenDate.frozen_today = FROZEN_DATE
 
         # Create one new card and mark it as "introduced today"
         card_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "new 1"}))
@@ -142,33 +372,161 @@ class TestCRUD(unittest.TestCase):
         next_card = crud.get_next_card_for_review(self.db, self.deck1.id, new_card_limit=1, total_limit=20)
         self.assertIsNone(next_card)
 
-    @patch('app.crud.date')
-    def test_get_reviews_done_today(self, mock_date):
+    def test_get_reviews_done_today(self):
         """Test the daily review counter."""
         FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
-        mock_date.today.return_value = FROZEN_TIME.date()
+        FrozenDate.frozen_today = FROZEN_TIME.date()
 
         card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "a"}))
 
-        with patch('app.crud.datetime') as mock_datetime:
-            # Log two reviews "today"
-            mock_datetime.now.return_value = FROZEN_TIME
-            crud.log_review(self.db, self.deck1.id, card.id, 3)
-            mock_datetime.now.return_value = FROZEN_TIME + timedelta(minutes=1)
-            crud.log_review(self.db, self.deck1.id, card.id, 3)
+        # Log two reviews "today"
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        crud.log_review(self.db, self.deck1.id, card.id, 3)
+        FrozenDatetime.frozen_now = FROZEN_TIME + timedelta(minutes=1)
+        crud.log_review(self.db, self.deck1.id, card.id, 3)
 
-            # Log one review "yesterday"
-            mock_datetime.now.return_value = FROZEN_TIME - timedelta(days=1)
-            crud.log_review(self.db, self.deck1.id, card.id, 3)
+        # Log one review "yesterday"
+        FrozenDatetime.frozen_now = FROZEN_TIME - timedelta(days=1)
+        crud.log_review(self.db, self.deck1.id, card.id, 3)
 
         count = crud.get_reviews_done_today(self.db, self.deck1.id)
         self.assertEqual(count, 2)
 
-    @patch('app.crud.datetime')
-    def test_get_next_card_ordering_within_queue(self, mock_datetime):
+    def test_log_reviews_bulk(self):
+        """Test that several reviews are logged in one call and counted for today."""
+        FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        FrozenDate.frozen_today = FROZEN_TIME.date()
+        card1 = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "a"}))
+        card2 = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "b"}))
+
+        logged = crud.log_reviews_bulk(self.db, [(self.deck1.id, card1.id, 3), (self.deck1.id, card2.id, 5), (self.deck1.id, card1.id, 1)])
+
+        self.assertEqual(logged, 3)
+        self.assertEqual(crud.get_reviews_done_today(self.db, self.deck1.id), 3)
+
+    def test_transaction_groups_writes(self):
+        """Test that writes inside transaction() are committed together, or not at all."""
+        card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "a"}))
+
+        with transaction(self.db):
+            crud.log_review(self.db, self.deck1.id, card.id, 3)
+            card.reviews = 1
+            crud.update_card_review_data(self.db, card)
+            # CRUD calls must not have committed the block early
+            self.assertTrue(self.db.in_transaction)
+        self.assertFalse(self.db.in_transaction)
+        self.assertEqual(crud.get_card(self.db, card.id).reviews, 1)
+
+        with self.assertRaises(RuntimeError):
+            with transaction(self.db):
+                crud.log_review(self.db, self.deck1.id, card.id, 3)
+                card.reviews = 2
+                crud.update_card_review_data(self.db, card)
+                raise RuntimeError("abort")
+        self.assertEqual(crud.get_card(self.db, card.id).reviews, 1)
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM review_history").fetchone()[0], 1)
+
+    def test_transaction_on_autocommit_connection(self):
+        """Test writes on a connection in autocommit mode, as opened by database.connect()."""
+        self.db.isolation_level = None
+        card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "a"}))
+        self.assertFalse(self.db.in_transaction)
+
+        with self.assertRaises(RuntimeError):
+            with transaction(self.db):
+                crud.delete_card(self.db, card.id)
+                raise RuntimeError("abort")
+        self.assertIsNone(self.db.isolation_level)
+        self.assertIsNotNone(crud.get_card(self.db, card.id))
+
+        with transaction(self.db):
+            crud.delete_card(self.db, card.id)
+        self.assertIsNone(crud.get_card(self.db, card.id))
+
+    def test_pool_acquire_times_out(self):
+        """Test that an exhausted pool raises PoolTimeout instead of blocking forever."""
+        pool = ConnectionPool(":memory:", 1)
+        self.addCleanup(pool.close)
+        conn = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.01)
+        pool.release(conn)
+        self.assertIs(pool.acquire(timeout=0.01), conn)
+
+    def test_get_new_cards_rated_today(self):
+        """Test that only cards introduced today are counted."""
+        FROZEN_DATE = date(2023, 10, 27)
+        FrozenDate.frozen_today = FROZEN_DATE
+
+        for intro_date in (FROZEN_DATE, FROZEN_DATE, FROZEN_DATE - timedelta(days=1), None):
+            card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": "a"}))
+            card.introduction_date = intro_date
+            crud.update_card_review_data(self.db, card)
+
+        self.assertEqual(crud.get_new_cards_rated_today(self.db, self.deck1.id), 2)
+
+    def test_get_study_context(self):
+        """Test that the combined study query agrees with the individual queue functions."""
+        FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        FrozenDate.frozen_today = FROZEN_TIME.date()
+
+        context = crud.get_study_context(self.db, self.deck1.id, new_card_limit=5)
+        self.assertEqual(context, {
+            "reviews_done_today": 0,
+            "queue_counts": {"learning": 0, "review": 0, "new": 0},
+            "next_card": None,
+        })
+
+        crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "new"}))
+        review_card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "review"}))
+        review_card.state = 'review'
+        review_card.next_review_date = FROZEN_TIME - timedelta(hours=1)
+        crud.update_card_review_data(self.db, review_card)
+        crud.log_review(self.db, self.deck1.id, review_card.id, 3)
+
+        context = crud.get_study_context(self.db, self.deck1.id, new_card_limit=5)
+        self.assertEqual(context["reviews_done_today"], crud.get_reviews_done_today(self.db, self.deck1.id))
+        self.assertEqual(context["queue_counts"], crud.get_queue_counts(self.db, self.deck1.id, 5))
+        self.assertEqual(context["next_card"], crud.get_next_card_for_review(self.db, self.deck1.id, 5, 20))
+        self.assertEqual(context["next_card"].id, review_card.id)
+
+    def test_get_all_decks_with_stats(self):
+        """Test that the one-query deck list agrees with the per-deck counters."""
+        FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        FrozenDate.frozen_today = FROZEN_TIME.date()
+        empty_deck = crud.create_deck(self.db, models.DeckCreate(name="Empty", card_template="t", card_css="c"))
+
+        for state, due, intro in (
+            ('new', FROZEN_TIME, None),
+            ('learning', FROZEN_TIME - timedelta(minutes=5), FROZEN_TIME.date()),
+            ('learning', FROZEN_TIME + timedelta(minutes=5), FROZEN_TIME.date()),
+            ('review', FROZEN_TIME + timedelta(hours=6), FROZEN_TIME.date() - timedelta(days=3)),
+            ('review', FROZEN_TIME + timedelta(days=2), None),
+        ):
+            card = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"q": state}))
+            card.state, card.next_review_date, card.introduction_date = state, due, intro
+            crud.update_card_review_data(self.db, card)
+        crud.log_review(self.db, self.deck1.id, card.id, 3)
+
+        stats = crud.get_all_decks_with_stats(self.db)
+        self.assertEqual([item["deck"].id for item in stats], [self.deck1.id, empty_deck.id])
+        self.assertEqual(stats[0]["deck"], crud.get_deck(self.db, self.deck1.id))
+        for item in stats:
+            deck_id = item["deck"].id
+            self.assertEqual(item["counts"], crud.get_queue_counts(self.db, deck_id, 5))
+            self.assertEqual(item["total_card_count"], crud.get_total_card_count_in_deck(self.db, deck_id))
+            self.assertEqual(item["reviews_done_today"], crud.get_reviews_done_today(self.db, deck_id))
+            self.assertEqual(item["new_cards_rated_today"], crud.get_new_cards_rated_today(self.db, deck_id))
+        self.assertEqual(stats[0]["counts"], {"learning": 1, "review": 1, "new": 1})
+        self.assertEqual((stats[0]["reviews_done_today"], stats[0]["new_cards_rated_today"]), (1, 2))
+
+    def test_get_next_card_ordering_within_queue(self):
         """Test that the card due earliest is returned first."""
         FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
-        mock_datetime.now.return_value = FROZEN_TIME
+        FrozenDatetime.frozen_now = FROZEN_TIME
 
         # Card due 10 minutes ago (should be picked second)
         card_model_2 = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "2"}))
@@ -185,11 +543,10 @@ class TestCRUD(unittest.TestCase):
         next_card = crud.get_next_card_for_review(self.db, self.deck1.id, 5, 20)
         self.assertEqual(next_card.id, card1.id)
 
-    @patch('app.crud.date')
-    def test_get_next_card_review_date_boundary(self, mock_date):
+    def test_get_next_card_review_date_boundary(self):
         """Test that a review card due yesterday is available today."""
         FROZEN_DATE = date(2023, 10, 27)
-        mock_date.today.return_value = FROZEN_DATE
+        FrozenDate.frozen_today = FROZEN_DATE
 
         # Card due just before midnight yesterday. Should be available.
         card_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "due"}))
@@ -233,40 +590,24 @@ class TestCRUD(unittest.TestCase):
         with self.assertRaises(sqlite3.IntegrityError):
             crud.create_card(self.db, card_model)
 
-    @patch('app.crud.date')
-    @patch('app.crud.datetime')
-    def test_get_queue_counts(self, mock_datetime, mock_date):
+    def test_get_queue_counts(self):
         """Verify the accuracy of the queue counting logic."""
         FROZEN_TIME = datetime(2023, 10, 27, 12, 0, 0)
-        mock_datetime.now.return_value = FROZEN_TIME
-        mock_date.today.return_value = FROZEN_TIME.date()
-
-        # 1. New card (should be counted)
-        crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "new"}))
-
-        # 2. Learning card due now (should be counted)
-        learning_due_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "learn_due"}))
-        learning_due_model.state = 'learning'
-        learning_due_model.next_review_date = FROZEN_TIME - timedelta(minutes=1)
-        crud.update_card_review_data(self.db, learning_due_model)
-
-        # 3. Learning card due in the future (should NOT be counted)
-        learning_future_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "learn_future"}))
-        learning_future_model.state = 'learning'
-        learning_future_model.next_review_date = FROZEN_TIME + timedelta(minutes=1)
-        crud.update_card_review_data(self.db, learning_future_model)
-
-        # 4. Review card due yesterday (should be counted)
-        review_due_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "review_due"}))
-        review_due_model.state = 'review'
-        review_due_model.next_review_date = FROZEN_TIME - timedelta(days=1)
-        crud.update_card_review_data(self.db, review_due_model)
-
-        # 5. Review card due tomorrow (should NOT be counted)
-        review_future_model = crud.create_card(self.db, models.CardCreate(deck_id=self.deck1.id, data={"card": "review_future"}))
-        review_future_model.state = 'review'
-        review_future_model.next_review_date = FROZEN_TIME + timedelta(days=1)
-        crud.update_card_review_data(self.db, review_future_model)
+        FrozenDatetime.frozen_now = FROZEN_TIME
+        FrozenDate.frozen_today = FROZEN_TIME.date()
+
+        # Build the fixture cards in a single transaction
+        with transaction(self.db):
+            # 1. New card (should be counted)
+            self._seed_card({"card": "new"}, due=FROZEN_TIME)
+            # 2. Learning card due now (should be counted)
+            self._seed_card({"card": "learn_due"}, 'learning', due=FROZEN_TIME - timedelta(minutes=1))
+            # 3. Learning card due in the future (should NOT be counted)
+            self._seed_card({"card": "learn_future"}, 'learning', due=FROZEN_TIME + timedelta(minutes=1))
+            # 4. Review card due yesterday (should be counted)
+            self._seed_card({"card": "review_due"}, 'review', due=FROZEN_TIME - timedelta(days=1))
+            # 5. Review card due tomorrow (should NOT be counted)
+            self._seed_card({"card": "review_future"}, 'review', due=FROZEN_TIME + timedelta(days=1))
         
         # The new card limit doesn't affect the count of available new cards.
         counts = crud.get_queue_counts(self.db, self.deck1.id, new_card_limit=5)
@@ -0,0 +1,94 @@
+# tests/test_main.py
+
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from app import crud, database, models
+
+class TestConcurrentRequests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Import the app against a throwaway database file instead of memo_flow.db."""
+        cls.tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(cls.tmp_dir, "test.db")
+        cls.pool = database.ConnectionPool(db_path, database.POOL_SIZE)
+        cls.patchers = [patch.object(database, "DATABASE_URL", db_path), patch.object(database, "pool", cls.pool)]
+        for patcher in cls.patchers:
+            patcher.start()
+        from app import main # Runs create_tables() on the patched database
+        cls.main = main
+        cls.app = main.app
+
+        conn = database.connect(db_path)
+        deck = crud.create_deck(conn, models.DeckCreate(name="Deck 1", card_template="{{ card.data.q }}", card_css=""))
+        crud.create_cards_bulk(conn, [models.CardCreate(deck_id=deck.id, data={"q": str(i)}) for i in range(3)])
+        conn.close()
+        cls.deck_id = deck.id
+
+    @classmethod
+    def tearDownClass(cls):
+        for patcher in cls.patchers:
+            patcher.stop()
+        cls.pool.close()
+        shutil.rmtree(cls.tmp_dir)
+
+    def setUp(self):
+        crud.clear_caches()
+        self.main._page_cache.clear()
+
+    def _get_concurrently(self, path: str, count: int):
+        async def fetch_all():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                requests = asyncio.gather(*(client.get(path) for _ in range(count)))
+                return await asyncio.wait_for(requests, 20)
+        return asyncio.run(fetch_all())
+
+    def test_more_requests_than_threads_and_connections(self):
+        """Test that requests queued for a connection don't starve the ones holding one."""
+        # Far more requests than the 40 worker threads and POOL_SIZE connections
+        responses = self._get_concurrently(f"/study/{self.deck_id}", 100)
+        self.assertEqual({response.status_code for response in responses}, {200})
+
+    def test_pool_timeout_returns_503(self):
+        """Test that a request which can't get a connection in time is answered with 503."""
+        with patch.object(self.pool, "acquire", side_effect=database.PoolTimeout("busy")):
+            responses = self._get_concurrently(f"/study/{self.deck_id}", 1)
+        self.assertEqual(responses[0].status_code, 503)
+    def test_query_string_not_part_of_page_cache_key(self):
+        """Test that made-up query strings reuse the cached page instead of adding entries."""
+        paths = [f"/decks?junk={i}" for i in range(20)] + [f"/progress/{self.deck_id}?page=1&x={i}" for i in range(20)]
+        for path in paths:
+            self.assertEqual(self._get_concurrently(path, 1)[0].status_code, 200)
+        self.assertEqual(len(self.main._page_cache), 2)
+
+    def test_page_cache_expires_and_is_bounded(self):
+        """Test that expired pages are dropped on lookup and the oldest ones are evicted."""
+        main = self.main
+        for deck_id in range(main.MAX_CACHED_PAGES + 10):
+            main.cache_page(main.page_cache_key("progress", deck_id, 1), main._page_cache_generation, main.HTMLResponse("x"))
+        self.assertEqual(len(main._page_cache), main.MAX_CACHED_PAGES)
+        self.assertNotIn(main.page_cache_key("progress", 0, 1), main._page_cache)
+
+        key = main.page_cache_key("progress", main.MAX_CACHED_PAGES, 1)
+        main._page_cache[key] = (0.0, b"stale")
+        self.assertIsNone(main.get_cached_page(key))
+        self.assertNotIn(key, main._page_cache)
+
+    def test_post_clears_page_cache(self):
+        """Test that a non-GET request drops the cached pages."""
+        self._get_concurrently("/decks", 1)
+        self.assertEqual(len(self.main._page_cache), 1)
+        async def post():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/preview_card", json={"template": "", "css": "", "sample_data": {}})
+        self.assertEqual(asyncio.run(post()).status_code, 200)
+        self.assertEqual(len(self.main._page_cache), 0)
@@ -7,7 +7,7 @@ from datetime import datetime, date, timedelta
 # This assumes your project root is in the Python path.
 # The run_tests.py script handles this.
 from app.models import Card
-from app.srs_algorithm import sm2_algorithm
+from app.srs_algorithm import sm2_algorithm, parse_learning_steps, ease_factor_delta
 
 class TestSRSAlgorithm(unittest.TestCase):
 
@@ -26,12 +26,13 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.learning_steps = [10, 1440]  # 10 minutes, 1 day
         self.graduating_interval = 4  # 4 days
 
-    @patch('app.srs_algorithm.date')
-    @patch('app.srs_algorithm.datetime')
-    def test_new_card_rated_good(self, mock_datetime, mock_date):
+        # Freeze the clock once for the whole test
+        datetime_patcher = patch('app.srs_algorithm.datetime')
+        self.addCleanup(datetime_patcher.stop)
+        datetime_patcher.start().now.return_value = self.FROZEN_DATETIME
+
+    def test_new_card_rated_good(self):
         """Test a new card being answered correctly for the first time."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
-        mock_date.today.return_value = self.FROZEN_DATE
         self.card.state = 'new'
 
         updated_card = sm2_algorithm(self.card, 3, self.learning_steps, self.graduating_interval)
@@ -42,12 +43,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertEqual(updated_card.reviews, 1)
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(minutes=10))
 
-    @patch('app.srs_algorithm.date')
-    @patch('app.srs_algorithm.datetime')
-    def test_new_card_rated_incorrect(self, mock_datetime, mock_date):
+    def test_new_card_rated_incorrect(self):
         """Test a new card being answered incorrectly."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
-        mock_date.today.return_value = self.FROZEN_DATE
         self.card.state = 'new'
 
         updated_card = sm2_algorithm(self.card, 1, self.learning_steps, self.graduating_interval)
@@ -59,10 +56,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         # It resets to the first learning step
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(minutes=10))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_learning_card_graduates(self, mock_datetime):
+    def test_learning_card_graduates(self):
         """Test a card graduating from 'learning' to 'review'."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'learning'
         self.card.learning_step = 2  # This is the last step
 
@@ -72,10 +67,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertEqual(updated_card.interval_days, self.graduating_interval)
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=self.graduating_interval))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_review_card_lapse(self, mock_datetime):
+    def test_review_card_lapse(self):
         """Test a graduated 'review' card that is answered incorrectly (a lapse)."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 20
         self.card.ease_factor = 2.5
@@ -88,10 +81,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertAlmostEqual(updated_card.ease_factor, 2.3) # 2.5 - 0.2 penalty
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(minutes=10))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_review_card_good(self, mock_datetime):
+    def test_review_card_good(self):
         """Test a standard 'review' card answered correctly."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 10
         self.card.ease_factor = 2.5
@@ -104,10 +95,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertAlmostEqual(updated_card.ease_factor, 2.36)
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=new_interval))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_review_card_easy(self, mock_datetime):
+    def test_review_card_easy(self):
         """Test a 'review' card answered 'Easy', increasing the ease factor."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 10
         self.card.ease_factor = 2.5
@@ -120,10 +109,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertAlmostEqual(updated_card.ease_factor, 2.6) # 2.5 + 0.1
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=new_interval))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_ease_factor_floor(self, mock_datetime):
+    def test_ease_factor_floor(self):
         """Test that the ease factor does not drop below 1.3."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 10
         self.card.ease_factor = 1.35
@@ -137,10 +124,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         updated_card = sm2_algorithm(self.card, 3, self.learning_steps, self.graduating_interval)
         self.assertEqual(updated_card.ease_factor, 1.3)
 
-    @patch('app.srs_algorithm.datetime')
-    def test_intermediate_learning_step(self, mock_datetime):
+    def test_intermediate_learning_step(self):
         """Test a correct answer on a card in the middle of learning steps."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'learning'
         self.card.learning_step = 1 # It has completed the first step (10 min)
 
@@ -154,10 +139,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         # The next review should be 60 minutes from now, as per learning_steps[1]
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(minutes=60))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_learning_card_lapse(self, mock_datetime):
+    def test_learning_card_lapse(self):
         """Test an incorrect answer on a card that is already in the learning state."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'learning'
         self.card.learning_step = 1 # It has already passed the first step
 
@@ -168,10 +151,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         # Next review is scheduled for the first step's interval
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(minutes=self.learning_steps[0]))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_graduation_with_no_learning_steps(self, mock_datetime):
+    def test_graduation_with_no_learning_steps(self):
         """Test that a new card graduates immediately if learning_steps is empty."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'new'
         empty_learning_steps = []
 
@@ -181,10 +162,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertEqual(updated_card.interval_days, self.graduating_interval)
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=self.graduating_interval))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_first_review_after_graduation(self, mock_datetime):
+    def test_first_review_after_graduation(self):
         """Test the first 'review' state evaluation after graduating."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 0 # As it would be right after graduation
         self.card.ease_factor = 2.5
@@ -197,10 +176,8 @@ class TestSRSAlgorithm(unittest.TestCase):
         self.assertAlmostEqual(updated_card.ease_factor, 2.36)
         self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=self.graduating_interval))
 
-    @patch('app.srs_algorithm.datetime')
-    def test_review_card_quality_4(self, mock_datetime):
+    def test_review_card_quality_4(self):
         """Test a 'review' card answered with quality=4 ('Good' but better than 3)."""
-        mock_datetime.now.return_value = self.FROZEN_DATETIME
         self.card.state = 'review'
         self.card.interval_days = 10
         self.card.ease_factor = 2.5
@@ -216,4 +193,29 @@ class TestSRSAlgorithm(unittest.TestCase):
         # EF + (0.1 - 1*(0.08+0.02)) = EF + (0.1 - 0.1) = EF + 0
         # So the ease factor should not change.
         self.assertAlmostEqual(updated_card.ease_factor, 2.5)
-        self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=new_interval))
\ No newline at end of file
+        self.assertEqual(updated_card.next_review_date, self.FROZEN_DATETIME + timedelta(days=new_interval))
+
+    def test_parse_learning_steps(self):
+        """Test that learning steps settings are parsed into minutes."""
+        self.assertEqual(parse_learning_steps("10 1440"), (10, 1440))
+        self.assertEqual(parse_learning_steps("  1   10 "), (1, 10))
+        self.assertEqual(parse_learning_steps(""), ())
+
+    def test_ease_factor_delta(self):
+        """Test the ease factor adjustment per quality, including ratings outside 0-5."""
+        self.assertAlmostEqual(ease_factor_delta(5), 0.1)
+        self.assertAlmostEqual(ease_factor_delta(4), 0.0)
+        self.assertAlmostEqual(ease_factor_delta(3), -0.14)
+        self.assertAlmostEqual(ease_factor_delta(6), 0.16)
+
+    def test_injected_review_time(self):
+        """Test that an explicit review time is used instead of the clock."""
+        self.card.state = 'new'
+
+        review_time = datetime(2024, 1, 2, 8, 30, 0)
+
+        updated_card = sm2_algorithm(self.card, 3, self.learning_steps, self.graduating_interval, now=review_time)
+
+        self.assertEqual(updated_card.last_reviewed_date, review_time)
+        self.assertEqual(updated_card.introduction_date, review_time.date())
+        self.assertEqual(updated_card.next_review_date, review_time + timedelta(minutes=10))
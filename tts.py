@@ -1,4 +1,6 @@
 from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+import argparse
 import os
 import time
 import json
@@ -9,11 +11,15 @@ def load_json(file):
         return d
     return None
 
-def generate_audio_files(word_list, output_dir=".", delay=3):
+def generate_audio_files(word_list, output_dir=".", delay=3, max_workers=4):
+    # Requests are network-bound, so a few run at once; each worker still
+    # waits `delay` seconds after its request to stay under the rate limit.
     def gen_word_sound(word):
+        filename = f"{output_dir}/{word}.mp3"
+        if os.path.exists(filename): # Generated by an earlier run
+            return
         try:
             tts = gTTS(text=word, lang='ja')
-            filename = f"{output_dir}/{word}.mp3"
             tts.save(filename)
             print(f"Generated word: {word}")
         except Exception as e:
@@ -21,13 +27,18 @@ def generate_audio_files(word_list, output_dir=".", delay=3):
         finally:
             time.sleep(delay)
 
-    for d in word_list:
-        word1 = d["word_1"]
-        word2 = d["word_2"]
-        gen_word_sound(word1)
-        gen_word_sound(word2)
+    # The same word can appear in several entries; synthesize it once
+    words = dict.fromkeys(word for d in word_list for word in (d["word_1"], d["word_2"]))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(gen_word_sound, words))
             
 
 if __name__ == '__main__':
-    data = load_json('hiragana2.json')
-    generate_audio_files(data, 'hiragana-sounds')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate MP3 pronunciations for word lists.")
+    parser.add_argument('files', nargs='*', default=['hiragana2.json'], help="JSON word lists to process")
+    parser.add_argument('-o', '--output-dir', default='hiragana-sounds')
+    args = parser.parse_args()
+
+    # All lists are handled in this one process and one pool of workers
+    data = [entry for file in args.files for entry in load_json(file)]
+    generate_audio_files(data, args.output_dir)
\ No newline at end of file